@@ -14,7 +14,7 @@ st.write("Use os botões abaixo para navegar entre as funcionalidades.")
 # Navigation menu in main screen
 st.subheader("📋 Menu de Navegação")
 
-col1, col2, col3, col4 = st.columns(4)
+col1, col2, col3, col4, col5 = st.columns(5)
 
 with col1:
     if st.button("🗺️ Mapa de Imóveis", use_container_width=True):
@@ -32,6 +32,10 @@ with col4:
     if st.button("📊 Estatísticas", use_container_width=True):
         st.switch_page("pages/estatisticas.py")
 
+with col5:
+    if st.button("⏱️ Desempenho", use_container_width=True):
+        st.switch_page("pages/desempenho.py")
+
 st.markdown("---")
 
 # Main content area
@@ -46,17 +50,17 @@ st.markdown("---")
 
 # Quick stats if data exists
 try:
-    from data import load_data
-    df = load_data()
-    if not df.empty:
+    from stats import stats_index
+    summary = stats_index().summary()
+    if summary["total"]:
         st.subheader("📈 Resumo Rápido")
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Total de Imóveis", len(df))
+            st.metric("Total de Imóveis", summary["total"])
         with col2:
-            st.metric("Preço Médio", f"R$ {df['Preço do Aluguel (R$)'].mean():,.0f}")
+            st.metric("Preço Médio", f"R$ {summary['preco_medio'] or 0:,.0f}")
         with col3:
-            st.metric("Melhor Avaliação", f"{df['Qualidade'].max()} ⭐")
+            st.metric("Melhor Avaliação", f"{summary['melhor_qualidade']:.0f} ⭐")
 except:
     pass
 
@@ -0,0 +1,151 @@
+import argparse
+import logging
+import threading
+import time
+
+import pandas as pd
+import requests
+
+import http_client
+from data import load_data, update_properties
+from utils import get_cached_geocode, nominatim_request, normalize_address, store_cached_geocode
+
+logger = logging.getLogger(__name__)
+
+# Política de uso do Nominatim público: no máximo 1 requisição por segundo
+DEFAULT_RATE = 1.0
+MAX_RETRIES = 5
+# O Nominatim também responde 403 quando o limite de uso é excedido
+RETRY_STATUS = http_client.RETRY_STATUS | {403}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate=DEFAULT_RATE, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def geocode_one(address, session, limiter, max_retries=MAX_RETRIES):
+    """
+    Geocodifica um endereço com a política de novas tentativas de http_client (backoff
+    exponencial, Retry-After), em 403/429/5xx também; toda tentativa passa pelo limitador.
+    Retorna (lat, lon), (None, None) se não encontrado, ou levanta a última exceção/erro HTTP.
+    """
+    response = nominatim_request(address, session=session, retries=max_retries,
+                                 retry_status=RETRY_STATUS, throttle=limiter.acquire)
+    response.raise_for_status()
+    data = response.json()
+    if data:
+        return float(data[0]["lat"]), float(data[0]["lon"])
+    return None, None
+
+
+def geocode_batch(df, address_column="Endereço", rate=DEFAULT_RATE, session=None, progress=None):
+    """
+    Preenche Latitude/Longitude de um DataFrame geocodificando cada endereço distinto uma vez.
+
+    Endereços são deduplicados pela forma normalizada. Cada resultado é gravado no cache de
+    geocodificação assim que chega, e o cache funciona como checkpoint: se o processo cair,
+    a próxima execução pula tudo o que já foi resolvido. Linhas que já têm coordenadas não
+    são tocadas. Erros (rede, HTTP) não vão para o cache de não encontrados: ficam em
+    resumo["falhas"] ({endereço: erro}) e a próxima execução tenta de novo. progress, se
+    dado, recebe (feitos, total, erros) a cada endereço. Retorna (df, resumo).
+    """
+    df = df.copy()
+    for col in ("Latitude", "Longitude"):
+        if col not in df.columns:
+            df[col] = float("nan")
+
+    missing = df["Latitude"].isna() | df["Longitude"].isna()
+    keys = df.loc[missing, address_column].fillna("").astype(str).map(normalize_address)
+    addresses = {}
+    for key, address in zip(keys, df.loc[missing, address_column]):
+        if key and key not in addresses:
+            addresses[key] = address
+
+    summary = {"enderecos": len(addresses), "cache": 0, "consultados": 0, "nao_encontrados": 0, "erros": 0, "falhas": {}}
+    results = {}
+    limiter = TokenBucket(rate=rate)
+    session = session or http_client.get_session()
+    for done, (key, address) in enumerate(addresses.items(), start=1):
+        coords = get_cached_geocode(address)
+        if coords is not None:
+            summary["cache"] += 1
+        else:
+            try:
+                coords = geocode_one(address, session, limiter)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                logger.warning("Falha ao geocodificar %s: %s", address, e)
+                summary["erros"] += 1
+                summary["falhas"][address] = str(e)
+            else:
+                summary["consultados"] += 1
+                store_cached_geocode(address, *coords)
+        if coords is not None:
+            if coords[0] is None:
+                summary["nao_encontrados"] += 1
+            else:
+                results[key] = coords
+        if progress:
+            progress(done, len(addresses), summary["erros"])
+
+    # Escrita em lote das coordenadas de volta no DataFrame
+    coords = keys.map(results)
+    found = coords.notna()
+    df.loc[found[found].index, "Latitude"] = coords[found].map(lambda c: c[0])
+    df.loc[found[found].index, "Longitude"] = coords[found].map(lambda c: c[1])
+    return df, summary
+
+
+def geocode_store(rate=DEFAULT_RATE, progress=None):
+    """Geocodifica os imóveis do banco sem coordenadas e grava todas numa única transação."""
+    df = load_data()
+    geocoded, summary = geocode_batch(df, rate=rate, progress=progress)
+    missing = df["Latitude"].isna() | df["Longitude"].isna()
+    filled = geocoded[missing & geocoded["Latitude"].notna()]
+    changes = {
+        property_id: {"Latitude": row["Latitude"], "Longitude": row["Longitude"]}
+        for property_id, row in filled.iterrows()
+    }
+    summary["atualizados"] = update_properties(changes) if changes else 0
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Geocodificação em lote de endereços de imóveis")
+    parser.add_argument("csv", nargs="?", help="CSV de entrada; sem ele, geocodifica os imóveis do banco sem coordenadas")
+    parser.add_argument("-o", "--output", help="CSV de saída (padrão: sobrescreve a entrada)")
+    parser.add_argument("--coluna", default="Endereço", help="Coluna com o endereço")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Requisições por segundo")
+    args = parser.parse_args()
+
+    def report(done, total, errors):
+        print(f"\r{done}/{total} endereços ({errors} com erro)", end="", flush=True)
+
+    if args.csv:
+        geocoded, summary = geocode_batch(pd.read_csv(args.csv), address_column=args.coluna, rate=args.rate, progress=report)
+        geocoded.to_csv(args.output or args.csv, index=False)
+    else:
+        summary = geocode_store(rate=args.rate, progress=report)
+    print()
+    failures = summary.pop("falhas")
+    print(summary)
+    for address, error in failures.items():
+        print(f"  erro em {address}: {error}")
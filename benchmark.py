@@ -0,0 +1,220 @@
+"""
+Benchmarks of the data paths and pages on synthetic datasets.
+
+Each dataset size runs in its own process and scratch directory (own imoveis.db), with
+Nominatim, Groq and the listing pages served by mock_servers.py, so the numbers do not
+depend on the network. Results are written as JSON; --compare flags regressions
+against an earlier run.
+
+    python benchmark.py                                  # 1k, 10k, 100k e 1M imóveis
+    python benchmark.py --sizes 1000 10000 -o atual.json
+    python benchmark.py --sizes 1000 --compare base.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+PAGES = ["app.py", "pages/mapa.py", "pages/estatisticas.py", "pages/lista.py"]
+# Operações mais lentas que isso em relação à base contam como regressão
+REGRESSION_THRESHOLD = 1.2
+# ...desde que a diferença passe disso (abaixo é ruído de medição)
+MIN_REGRESSION_S = 0.001
+
+
+def _repeats(size):
+    return 5 if size <= 10_000 else 3 if size <= 100_000 else 1
+
+
+def _measure(func, repeats, setup=None):
+    times = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(times), "min_s": min(times), "runs": repeats}
+
+
+def run_size(size, skip_pages=False):
+    """Runs every benchmark against a fresh store of `size` synthetic properties (current directory)."""
+    import data
+    import filters
+    import scraper
+    import utils
+    from maps import build_map
+    from spatial import SpatialIndex
+    from stats import StatsIndex
+    from synthetic import generate_properties
+
+    base_url = os.environ["MOCK_BASE_URL"]
+    repeats = _repeats(size)
+    results = {}
+
+    def bench(name, func, setup=None, repeat=repeats):
+        results[name] = _measure(func, repeat, setup)
+        print(f"  {size:>9,} {name:<28} {results[name]['median_s'] * 1000:10.1f} ms", file=sys.stderr, flush=True)
+
+    df = generate_properties(size)
+    bench("gerar_dataset", lambda: generate_properties(size), repeat=1)
+    bench("save_data", lambda: data.save_data(df.copy()), repeat=1)
+
+    def clear_cache(remove_snapshot):
+        def setup():
+            data._cache["key"] = None
+            if remove_snapshot and os.path.exists("imoveis.arrow"):
+                os.remove("imoveis.arrow")
+        return setup
+
+    bench("load_data_sqlite", data.load_data, setup=clear_cache(True))
+    data.save_snapshot()
+    bench("load_data_snapshot", data.load_data, setup=clear_cache(False))
+    bench("load_data_cache", data.load_data)
+
+    ids = itertools.cycle(data.load_data().index[:: max(1, size // 50)].tolist())
+    bench("query_properties_busca", lambda: data.query_properties("Batel", "Preço do Aluguel (R$)", False, 50, 100))
+    bench("query_properties_relevancia", lambda: data.query_properties("varanda", "relevancia", True, 50, 0))
+    bench("search_properties", lambda: data.search_properties("Guarapuava"))
+    bench("query_properties_url", lambda: data.query_properties(None, "Qualidade", False, 20, 0, only_with_url=True))
+    bench("get_property", lambda: data.get_property(next(ids)))
+    bench("update_property", lambda: data.update_property(next(ids), {"Qualidade": 4}))
+
+    df, version = data.load_data_versioned()
+    bench("property_index", lambda: filters.PropertyIndex(df, version))
+    index = filters.PropertyIndex(df, version)
+    ranges = {"Preço do Aluguel (R$)": (1500, 2500), "Quartos": (2, 3), "Qualidade": (3, 5)}
+    bench("filtro_mapa", lambda: index.filter(ranges))
+    filtered = index.filter(ranges)
+    bench("build_map", lambda: build_map(filtered).get_root().render())
+
+    def force_rebuild(derived):
+        def setup():
+            derived.version = None
+        return setup
+
+    # Uma instância de cada, reconstruída a cada medição: cada instância nova registraria
+    # mais um listener em data, pago por todas as gravações medidas depois
+    stats = StatsIndex()
+    bench("stats_rebuild", stats.current, setup=force_rebuild(stats))
+    stats.current()
+    bench("stats_consultas", lambda: (stats.summary(), stats.price_box_by_quality(), stats.rooms_histogram(), stats.top()))
+
+    spatial = SpatialIndex()
+    bench("spatial_rebuild", spatial.current, setup=force_rebuild(spatial))
+    spatial.current()
+    bench("spatial_raio", lambda: spatial.radius(-25.4284, -49.2733, 1.5))
+    bench("spatial_k_vizinhos", lambda: spatial.nearest(-25.4284, -49.2733, 10))
+    for derived in (stats, spatial):
+        data.remove_listener(derived._on_write)
+
+    # Serviços externos simulados; cada chamada "miss" usa um endereço/página inédito
+    counter = itertools.count()
+    bench("geocode_miss", lambda: utils.geocode_address(f"Rua Benchmark {next(counter)}, Curitiba"))
+    bench("geocode_cache", lambda: utils.geocode_address("Rua Benchmark 0, Curitiba"))
+    bench("get_page_content", lambda: scraper.get_page_content(f"{base_url}/anuncio/{next(counter)}"))
+    bench("extract_property_data", lambda: scraper.extract_property_data(
+        scraper.get_page_content(f"{base_url}/anuncio/{next(counter)}"), os.environ["GROQ_API_KEY"]))
+
+    if not skip_pages:
+        from streamlit.testing.v1 import AppTest
+
+        for page in PAGES:
+            path = os.path.join(REPO_DIR, page)
+            bench(f"pagina {page}", lambda: AppTest.from_file(path, default_timeout=600).run(), repeat=min(repeats, 3))
+    return results
+
+
+def _run_child(size, base_url, skip_pages):
+    env = {
+        **os.environ,
+        "PYTHONPATH": REPO_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        "MOCK_BASE_URL": base_url,
+        "NOMINATIM_URL": f"{base_url}/search",
+        "GROQ_BASE_URL": base_url,
+        "GROQ_API_KEY": "mock",
+        "PYTHONWARNINGS": "ignore",
+    }
+    command = [sys.executable, os.path.abspath(__file__), "--child", str(size)] + (["--skip-pages"] if skip_pages else [])
+    with tempfile.TemporaryDirectory(prefix="imoveis-bench-") as workdir:
+        result = subprocess.run(command, cwd=workdir, env=env, stdout=subprocess.PIPE, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """[(tamanho, operação, base_s, atual_s, razão)] of operations slower than threshold × baseline."""
+    regressions = []
+    for size, operations in current["results"].items():
+        for name, result in operations.items():
+            before = baseline.get("results", {}).get(size, {}).get(name)
+            if before and before["median_s"] > 0:
+                ratio = result["median_s"] / before["median_s"]
+                if ratio > threshold and result["median_s"] - before["median_s"] > MIN_REGRESSION_S:
+                    regressions.append((size, name, before["median_s"], result["median_s"], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks com conjuntos de imóveis sintéticos")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Tamanhos dos conjuntos")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="Arquivo JSON de saída")
+    parser.add_argument("--compare", metavar="JSON", help="Resultado anterior para detectar regressões")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Razão atual/base acima da qual a operação é considerada regressão")
+    parser.add_argument("--skip-pages", action="store_true", help="Não renderiza as páginas Streamlit")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_size(args.child, args.skip_pages)))
+        return
+
+    from mock_servers import start_mock_server
+
+    server, base_url = start_mock_server()
+    try:
+        report = {
+            "meta": {
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "plataforma": platform.platform(),
+                "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "results": {str(size): _run_child(size, base_url, args.skip_pages) for size in args.sizes},
+        }
+    finally:
+        server.shutdown()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for size, name, before, after, ratio in regressions:
+            print(f"REGRESSÃO {int(size):,} {name}: {before * 1000:.1f} ms -> {after * 1000:.1f} ms ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print("Nenhuma regressão acima do limite.")
+
+
+if __name__ == "__main__":
+    main()
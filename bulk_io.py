@@ -0,0 +1,198 @@
+"""
+Bulk import and export of properties as CSV or JSON Lines, in chunks.
+
+Imports stream the file chunk by chunk: each row is coerced with the same rules as
+the LLM extraction (scraper.normalize_property_data), rows that dedup.py considers the
+same listing as one already in the store or earlier in the file are skipped, and each
+chunk is written in one transaction. Exports read the store with a
+cursor, so neither direction holds the whole dataset in memory.
+
+    python bulk_io.py importar imoveis.csv
+    python bulk_io.py importar anuncios.jsonl --chunk-size 10000
+    python bulk_io.py exportar backup.jsonl
+"""
+import argparse
+import io
+import json
+import os
+
+import pandas as pd
+
+from data import COLUMNS, insert_properties, iter_properties
+from dedup import DuplicateTable, duplicate_index
+from scraper import normalize_property_data
+
+CHUNK_SIZE = 5000
+FORMATS = ["csv", "jsonl"]
+NUMERIC_COLUMNS = ["Tamanho (m²)", "Quartos", "Banheiros", "Preço do Aluguel (R$)", "Qualidade", "Latitude", "Longitude"]
+
+
+def detect_format(name):
+    """'csv' or 'jsonl' from a file name; raises ValueError for anything else."""
+    extension = os.path.splitext(str(name))[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    raise ValueError(f"Formato não suportado: {name} (use .csv ou .jsonl)")
+
+
+def _text_stream(source):
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, encoding="utf-8")
+    if isinstance(source, io.TextIOBase):
+        return source
+    return io.TextIOWrapper(source, encoding="utf-8")
+
+
+def read_chunks(source, fmt, chunk_size=CHUNK_SIZE):
+    """
+    Yields (DataFrame, invalid_lines) per chunk of the file, every value still as text.
+    source is a path or a file object (binary or text).
+    """
+    if fmt == "csv":
+        reader = pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False, encoding="utf-8")
+        for chunk in reader:
+            yield chunk, 0
+        return
+
+    stream = _text_stream(source)
+    records, invalid = [], 0
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            invalid += 1
+            continue
+        if not isinstance(record, dict):
+            invalid += 1
+            continue
+        records.append(record)
+        if len(records) >= chunk_size:
+            yield pd.DataFrame.from_records(records), invalid
+            records, invalid = [], 0
+    if records or invalid:
+        yield pd.DataFrame.from_records(records), invalid
+
+
+def coerce_chunk(df):
+    """
+    Converts one raw chunk into store records with the extraction rules. Returns
+    (records, invalid) — rows without an address count as invalid.
+    """
+    df = df.reindex(columns=COLUMNS)
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    # ISO (o formato do banco) ou dd/mm/aaaa; datas ilegíveis ficam como ausentes
+    visits = df["Data da Visita"].replace("", None)
+    parsed = pd.to_datetime(visits, errors="coerce", format="ISO8601")
+    parsed = parsed.fillna(pd.to_datetime(visits, errors="coerce", format="%d/%m/%Y"))
+    df["Data da Visita"] = parsed.dt.strftime("%Y-%m-%d")
+
+    records, invalid = [], 0
+    for row in df.to_dict("records"):
+        address = str(row["Endereço"]).strip() if pd.notna(row["Endereço"]) else ""
+        if not address:
+            invalid += 1
+            continue
+        record = normalize_property_data({col: None if pd.isna(value) else value for col, value in row.items()})
+        record["Endereço"] = address
+        record["Observações"] = str(record.get("Observações") or "")
+        record["URL"] = str(record.get("URL") or "").strip()
+        records.append(record)
+    return records, invalid
+
+
+def import_file(source, fmt, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Imports a CSV/JSONL file into the store and returns the counts
+    {"lidos", "importados", "duplicados", "invalidos"}. progress, if given, is called
+    with the running counts after each chunk.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato não suportado: {fmt}")
+    summary = {"lidos": 0, "importados": 0, "duplicados": 0, "invalidos": 0}
+    for chunk, bad_lines in read_chunks(source, fmt, chunk_size):
+        records, invalid = coerce_chunk(chunk)
+        # Mesma regra de duplicado do cadastro: contra o banco (índice atualizado pelas
+        # gravações dos lotes anteriores) e contra as linhas anteriores deste lote
+        stored = duplicate_index()
+        in_chunk = DuplicateTable()
+        new_records = []
+        for record in records:
+            if stored.candidates(record) or in_chunk.candidates(record):
+                summary["duplicados"] += 1
+                continue
+            in_chunk.add(len(new_records), record)
+            new_records.append(record)
+        insert_properties(new_records)
+        summary["lidos"] += len(chunk) + bad_lines
+        summary["invalidos"] += invalid + bad_lines
+        summary["importados"] += len(new_records)
+        if progress:
+            progress(dict(summary))
+    return summary
+
+
+def _export_pieces(fmt, chunk_size):
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato não suportado: {fmt}")
+    first = True
+    for chunk in iter_properties(chunk_size):
+        if fmt == "csv":
+            yield chunk.to_csv(index=False, header=first), len(chunk)
+        else:
+            # to_json(lines=True) já termina a última linha com "\n"
+            yield chunk.to_json(orient="records", lines=True, force_ascii=False), len(chunk)
+        first = False
+    if first and fmt == "csv":
+        yield ",".join(COLUMNS) + "\n", 0
+
+
+def export_chunks(fmt, chunk_size=CHUNK_SIZE):
+    """Yields the store as CSV/JSONL text, one piece per chunk (the CSV header comes with the first)."""
+    for piece, _ in _export_pieces(fmt, chunk_size):
+        yield piece
+
+
+def export_file(target, fmt, chunk_size=CHUNK_SIZE):
+    """Writes the whole store to target (a path or a text file object); returns the rows written."""
+    written = 0
+    stream = open(target, "w", encoding="utf-8", newline="") if isinstance(target, (str, os.PathLike)) else target
+    try:
+        for piece, rows in _export_pieces(fmt, chunk_size):
+            stream.write(piece)
+            written += rows
+    finally:
+        if stream is not target:
+            stream.close()
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importação e exportação em lote de imóveis (CSV ou JSONL)")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+    for name, help_text in [("importar", "Importa um arquivo para o banco"), ("exportar", "Exporta o banco para um arquivo")]:
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("arquivo")
+        sub.add_argument("--formato", choices=FORMATS, help="Padrão: pela extensão do arquivo")
+        sub.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Linhas por lote")
+    args = parser.parse_args()
+
+    try:
+        fmt = args.formato or detect_format(args.arquivo)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.comando == "importar":
+        def show(counts):
+            print(f"  {counts['lidos']} linhas lidas, {counts['importados']} importadas", flush=True)
+
+        result = import_file(args.arquivo, fmt, args.chunk_size, progress=show)
+        print(f"{result['importados']} imóveis importados de {args.arquivo} "
+              f"({result['duplicados']} duplicados, {result['invalidos']} inválidos ignorados)")
+    else:
+        print(f"{export_file(args.arquivo, fmt, args.chunk_size)} imóveis exportados para {args.arquivo}")
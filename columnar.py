@@ -0,0 +1,113 @@
+import logging
+import os
+import tempfile
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow é opcional: sem ele o app lê direto do SQLite
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = 'imoveis.arrow'
+
+# Tipos declarados de cada coluna no snapshot. Qualidade/quartos/banheiros ficam como
+# inteiros pequenos (e não categóricos) para que médias e filtros por faixa continuem valendo.
+SCHEMA_TYPES = {
+    'Endereço': 'string',
+    'Tamanho (m²)': 'float64',
+    'Quartos': 'int16',
+    'Banheiros': 'int16',
+    'Preço do Aluguel (R$)': 'float64',
+    'Observações': 'string',
+    'Qualidade': 'int8',
+    'Data da Visita': 'date32',
+    'Latitude': 'float32',
+    'Longitude': 'float32',
+    'URL': 'string',
+}
+
+
+def available():
+    """True when pyarrow is installed and snapshots can be used."""
+    return pa is not None
+
+
+def schema():
+    fields = [pa.field('id', pa.int64(), nullable=False)]
+    fields += [pa.field(col, getattr(pa, kind)()) for col, kind in SCHEMA_TYPES.items()]
+    return pa.schema(fields)
+
+
+def _column(values, kind):
+    if kind == 'date32':
+        # Datas inválidas ou vazias viram nulas em vez de quebrar o snapshot inteiro
+        parsed = pd.to_datetime(pd.Series(values, dtype=object), errors='coerce', format='ISO8601')
+        return pa.array(parsed.dt.date, type=pa.date32(), from_pandas=True)
+    if kind == 'string':
+        return pa.array(['' if v is None else str(v) for v in values], type=pa.string())
+    if kind.startswith('int'):
+        values = [None if v is None or pd.isna(v) else int(v) for v in values]
+    return pa.array(values, type=getattr(pa, kind)(), from_pandas=True)
+
+
+def table_from_rows(rows, columns):
+    """Builds an Arrow table with the declared schema from (id, *columns) tuples."""
+    data = list(zip(*rows)) if rows else [()] * (len(columns) + 1)
+    arrays = [pa.array(data[0], type=pa.int64())]
+    arrays += [_column(list(values), SCHEMA_TYPES[col]) for col, values in zip(columns, data[1:])]
+    return pa.Table.from_arrays(arrays, schema=schema())
+
+
+def frame_from_table(table):
+    """
+    Converts a snapshot table into the frame returned by data.load_data.
+
+    Text columns stay in Arrow memory (pyarrow-backed strings) instead of becoming
+    Python objects; numeric columns keep their declared widths.
+    """
+    df = table.to_pandas(
+        types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get,
+        date_as_object=False,
+    )
+    return df.set_index('id')
+
+
+def write_snapshot(table, version, source, path=SNAPSHOT_FILE):
+    """Writes table as an Arrow IPC (Feather v2) file tagged with its data version, atomically."""
+    metadata = {b'versao_dados': str(version).encode(), b'origem': os.path.abspath(source).encode()}
+    table = table.replace_schema_metadata(metadata)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.imoveis-', suffix='.arrow', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    except OSError:
+        logger.exception("Não foi possível gravar o snapshot %s", path)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_snapshot(version, source, path=SNAPSHOT_FILE):
+    """
+    Memory-maps the snapshot and returns its table, or None if it is missing, from
+    another store or from another data version.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with pa.memory_map(path, 'r') as source_file:
+            reader = pa.ipc.open_file(source_file)
+            metadata = reader.schema.metadata or {}
+            if (metadata.get(b'versao_dados') != str(version).encode()
+                    or metadata.get(b'origem') != os.path.abspath(source).encode()
+                    or not reader.schema.remove_metadata().equals(schema())):
+                return None
+            return reader.read_all()
+    except (OSError, pa.ArrowInvalid):
+        logger.warning("Snapshot %s ilegível; relendo do banco", path, exc_info=True)
+        return None
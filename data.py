@@ -1,25 +1,717 @@
 import pandas as pd
+import atexit
+import datetime
+import logging
 import os
+import re
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+
+import columnar
+import metrics
+
+logger = logging.getLogger(__name__)
 
 DATA_FILE = 'imoveis.csv'
+DB_FILE = 'imoveis.db'
+
+COLUMNS = [
+    'Endereço', 'Tamanho (m²)', 'Quartos', 'Banheiros', 'Preço do Aluguel (R$)',
+    'Observações', 'Qualidade', 'Data da Visita', 'Latitude', 'Longitude', 'URL'
+]
+
+COLUMN_TYPES = {
+    'Endereço': 'TEXT',
+    'Tamanho (m²)': 'REAL',
+    'Quartos': 'INTEGER',
+    'Banheiros': 'INTEGER',
+    'Preço do Aluguel (R$)': 'REAL',
+    'Observações': 'TEXT',
+    'Qualidade': 'INTEGER',
+    'Data da Visita': 'TEXT',
+    'Latitude': 'REAL',
+    'Longitude': 'REAL',
+    'URL': 'TEXT',
+}
+
+TEXT_COLUMNS = [col for col, kind in COLUMN_TYPES.items() if kind == 'TEXT']
+SORTABLE_COLUMNS = ['Endereço', 'Tamanho (m²)', 'Quartos', 'Preço do Aluguel (R$)', 'Qualidade', 'Data da Visita']
+
+# Busca de texto completo: colunas indexadas e o peso de cada uma no ranking (bm25)
+SEARCH_COLUMNS = ['Endereço', 'Observações', 'URL']
+SEARCH_WEIGHTS = [3.0, 1.0, 0.5]
+# Palavras ignoradas nas buscas (só quando há outras)
+SEARCH_STOPWORDS = {
+    'a', 'o', 'as', 'os', 'e', 'de', 'da', 'do', 'das', 'dos', 'em', 'na', 'no', 'nas', 'nos',
+    'com', 'para', 'por', 'um', 'uma', 'ao', 'à',
+}
+
+# Versão do esquema gravada em PRAGMA user_version: a criação/migração roda uma vez por banco
+SCHEMA_VERSION = 2
+
+# Serializes writers inside this process; SQLite handles other processes.
+_write_lock = threading.Lock()
+# Serializes schema creation/migration inside this process (BEGIN IMMEDIATE covers other processes)
+_schema_lock = threading.Lock()
+_initialized = set()
+_listeners = []
+
+# Process-wide copy of the table shared by every Streamlit session, keyed by data version
+_cache_lock = threading.Lock()
+# 'unsaved' is the Arrow table read from SQLite that the snapshot on disk doesn't have yet
+_cache = {'key': None, 'df': None, 'unsaved': None}
+
+
+class ConflictError(Exception):
+    """A write was based on an outdated version of a property (someone else changed it)."""
+
+    def __init__(self, property_id, expected_version, current_version):
+        super().__init__(
+            f"Imóvel {property_id} foi alterado por outra sessão "
+            f"(versão esperada {expected_version}, atual {current_version})"
+        )
+        self.property_id = property_id
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _index_name(column):
+    return "imoveis_" + "".join(ch if ch.isalnum() else "_" for ch in column.encode("ascii", "ignore").decode())
+
+
+def _clean_value(value):
+    """Converts pandas/numpy values into something sqlite3 can bind."""
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if isinstance(value, datetime.date):
+        # Datas lidas do snapshot colunar voltam para o texto ISO guardado no banco
+        return value.strftime('%Y-%m-%d')
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+def _record_values(record):
+    return [_clean_value(record.get(col)) for col in COLUMNS]
+
+
+def _ensure_schema(conn):
+    """Creates/migrates the schema in a single write transaction (call with _schema_lock held)."""
+    # O modo WAL é persistente e não pode ser trocado dentro de uma transação
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            _create_schema(conn)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        # Migração automática do CSV legado na primeira abertura do banco
+        empty = conn.execute("SELECT 1 FROM imoveis LIMIT 1").fetchone() is None
+        if empty and os.path.exists(DATA_FILE):
+            _import_csv(conn, DATA_FILE)
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def _create_schema(conn):
+    columns_sql = ", ".join(f"{_quote(col)} {COLUMN_TYPES[col]}" for col in COLUMNS)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS imoveis (id INTEGER PRIMARY KEY AUTOINCREMENT, {columns_sql})")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT)")
+    # Versão 2: tabelas da fila de tarefas (jobs.py) e dos caches de geocodificação
+    # (utils.py) e de extração (scraper.py), antes criadas a cada conexão
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, tipo TEXT NOT NULL, estado TEXT NOT NULL, "
+        "imovel_id INTEGER, parametros TEXT, resultado TEXT, erro TEXT, "
+        "criado_em REAL, atualizado_em REAL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS geocode_cache ("
+        "chave TEXT PRIMARY KEY, latitude REAL, longitude REAL, criado_em REAL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS extraction_cache ("
+        "chave TEXT PRIMARY KEY, modelo TEXT, dados TEXT, tokens INTEGER, "
+        "acertos INTEGER DEFAULT 0, criado_em REAL, usado_em REAL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS extraction_cache_usado_em ON extraction_cache (usado_em)")
+    conn.execute("CREATE TABLE IF NOT EXISTS extraction_cache_stats (nome TEXT PRIMARY KEY, valor INTEGER)")
+    # Bancos criados antes do controle de versão por registro
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(imoveis)")}
+    if 'versao' not in existing:
+        try:
+            conn.execute("ALTER TABLE imoveis ADD COLUMN versao INTEGER NOT NULL DEFAULT 1")
+        except sqlite3.OperationalError as e:
+            # Outra conexão acrescentou a coluna entre a verificação e o ALTER
+            if "duplicate column" not in str(e):
+                raise
+    # Índices para ordenação/paginação sem varrer a tabela
+    for col in SORTABLE_COLUMNS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {_index_name(col)} ON imoveis ({_quote(col)})")
+    _ensure_search_index(conn)
+
+
+def _search_triggers():
+    cols = ", ".join(_quote(c) for c in SEARCH_COLUMNS)
+    new_values = ", ".join(f"new.{_quote(c)}" for c in SEARCH_COLUMNS)
+    old_values = ", ".join(f"old.{_quote(c)}" for c in SEARCH_COLUMNS)
+    return {
+        "imoveis_busca_insert": f"AFTER INSERT ON imoveis BEGIN "
+                                f"INSERT INTO imoveis_busca (rowid, {cols}) VALUES (new.id, {new_values}); END",
+        "imoveis_busca_delete": f"AFTER DELETE ON imoveis BEGIN "
+                                f"INSERT INTO imoveis_busca (imoveis_busca, rowid, {cols}) "
+                                f"VALUES ('delete', old.id, {old_values}); END",
+        "imoveis_busca_update": f"AFTER UPDATE OF {cols} ON imoveis BEGIN "
+                                f"INSERT INTO imoveis_busca (imoveis_busca, rowid, {cols}) "
+                                f"VALUES ('delete', old.id, {old_values}); "
+                                f"INSERT INTO imoveis_busca (rowid, {cols}) VALUES (new.id, {new_values}); END",
+    }
+
+
+def _ensure_search_index(conn):
+    """
+    Full-text index (FTS5) over SEARCH_COLUMNS, with accents removed and prefix indexes.
+    Triggers keep it in sync with every write to imoveis, from this or any other process.
+    Runs only inside the schema step (once per database); the existing rows are indexed
+    only when the FTS table is created here.
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'imoveis_busca'").fetchone()
+    conn.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS imoveis_busca USING fts5({', '.join(_quote(c) for c in SEARCH_COLUMNS)}, "
+        "content='imoveis', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    for name, body in _search_triggers().items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    if not exists:
+        # Banco anterior ao índice: indexa o que já existe
+        conn.execute("INSERT INTO imoveis_busca (imoveis_busca) VALUES ('rebuild')")
+
+
+def get_connection():
+    """Opens a connection to the property store, creating/migrating it if needed."""
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if DB_FILE not in _initialized:
+        with _schema_lock:
+            # Outra thread pode ter terminado a criação enquanto esta esperava
+            if DB_FILE not in _initialized:
+                try:
+                    _ensure_schema(conn)
+                except BaseException:
+                    conn.close()
+                    raise
+                _initialized.add(DB_FILE)
+    return conn
+
+
+@contextmanager
+def _connect():
+    conn = get_connection()
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _read_csv(path):
+    df = pd.read_csv(path)
+    for col in COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    for col in TEXT_COLUMNS:
+        df[col] = df[col].fillna('').astype(str)
+    return df[COLUMNS]
+
+
+def _bump_version(conn):
+    """Increments the write-version counter inside the caller's transaction and returns it."""
+    conn.execute(
+        "INSERT INTO meta (chave, valor) VALUES ('versao_dados', '1') "
+        "ON CONFLICT(chave) DO UPDATE SET valor = CAST(valor AS INTEGER) + 1"
+    )
+    return _read_version(conn)
+
+
+def _read_version(conn):
+    row = conn.execute("SELECT valor FROM meta WHERE chave = 'versao_dados'").fetchone()
+    return int(row[0]) if row else 0
+
+
+def data_version():
+    """Returns the store's write-version counter; it changes on every write."""
+    with _connect() as conn:
+        return _read_version(conn)
+
+
+def _insert_rows(conn, rows, with_ids=False):
+    cols = (['id'] if with_ids else []) + COLUMNS
+    placeholders = ", ".join("?" for _ in cols)
+    conn.executemany(
+        f"INSERT INTO imoveis ({', '.join(_quote(c) for c in cols)}) VALUES ({placeholders})",
+        rows,
+    )
+
+
+def _import_csv(conn, path):
+    # Each CSV is imported only once, so re-running a migration never duplicates rows
+    key = 'csv_migrado:' + os.path.abspath(path)
+    if conn.execute("SELECT 1 FROM meta WHERE chave = ?", (key,)).fetchone():
+        return 0
+    df = _read_csv(path)
+    _insert_rows(conn, (_record_values(row) for row in df.to_dict('records')))
+    conn.execute("INSERT INTO meta (chave, valor) VALUES (?, ?)", (key, str(len(df))))
+    _bump_version(conn)
+    return len(df)
+
+
+def migrate_csv(path=DATA_FILE):
+    """Imports a legacy imoveis.csv into the store, appending to existing records."""
+    with _write_lock:
+        with _connect() as conn:
+            imported = _import_csv(conn, path)
+            version = _read_version(conn)
+        if imported:
+            _notify([("reset", None, None)], version)
+        return imported
+
+
+def _frame_from_rows(rows):
+    df = pd.DataFrame.from_records(rows, columns=['id'] + COLUMNS, index='id')
+    for col in TEXT_COLUMNS:
+        df[col] = df[col].fillna('').astype(str)
+    # Mesmo tipo de data do snapshot colunar, com ou sem pyarrow instalado
+    df['Data da Visita'] = pd.to_datetime(df['Data da Visita'].replace('', None), errors='coerce', format='ISO8601')
+    return df
+
+
+@metrics.timed("load_data")
+def load_data_versioned():
+    """Like load_data, but also returns the data version the frame corresponds to."""
+    with _connect() as conn:
+        version = _read_version(conn)
+        key = (os.path.abspath(DB_FILE), version)
+        with _cache_lock:
+            if _cache['key'] == key:
+                # Shallow copy: callers can add/replace columns without touching the cache
+                return _cache['df'].copy(deep=False), version
+        table = columnar.read_snapshot(version, DB_FILE) if columnar.available() else None
+        if table is None:
+            select_cols = ", ".join(_quote(c) for c in ['id'] + COLUMNS)
+            rows = conn.execute(f"SELECT {select_cols} FROM imoveis ORDER BY id").fetchall()
+    unsaved = None
+    if not columnar.available():
+        df = _frame_from_rows(rows)
+    else:
+        if table is None:
+            # Gravado só ao sair do processo (save_snapshot), nunca durante uma requisição
+            table = unsaved = columnar.table_from_rows(rows, COLUMNS)
+        df = columnar.frame_from_table(table)
+    with _cache_lock:
+        _cache['key'] = key
+        _cache['df'] = df
+        _cache['unsaved'] = unsaved
+    return df.copy(deep=False), version
+
 
 def load_data():
-    if os.path.exists(DATA_FILE):
-        df = pd.read_csv(DATA_FILE)
-        # Garantir que a coluna URL seja string
-        if 'URL' in df.columns:
-            df['URL'] = df['URL'].astype(str)
-        return df
-    return pd.DataFrame(columns=[
-        'Endereço', 'Tamanho (m²)', 'Quartos', 'Banheiros', 'Preço do Aluguel (R$)',
-        'Observações', 'Qualidade', 'Data da Visita', 'Latitude', 'Longitude', 'URL'
-    ])
+    """
+    Returns all properties indexed by id.
 
+    The table is only re-read when the write-version counter changed, so reruns
+    that don't touch the data reuse the process-wide cached frame. With pyarrow
+    installed, a fresh process memory-maps the columnar snapshot (columnar.py)
+    of the current version instead of querying SQLite.
+    """
+    return load_data_versioned()[0]
+
+
+def save_snapshot():
+    """
+    Writes the columnar snapshot of the current data version (python data.py --snapshot)
+    and returns that version, or None without pyarrow.
+    """
+    if not columnar.available():
+        return None
+    with _connect() as conn:
+        version = _read_version(conn)
+        select_cols = ", ".join(_quote(c) for c in ['id'] + COLUMNS)
+        rows = conn.execute(f"SELECT {select_cols} FROM imoveis ORDER BY id").fetchall()
+    columnar.write_snapshot(columnar.table_from_rows(rows, COLUMNS), version, DB_FILE)
+    with _cache_lock:
+        if _cache['key'] == (os.path.abspath(DB_FILE), version):
+            _cache['unsaved'] = None
+    return version
+
+
+@atexit.register
+def _save_snapshot_at_exit():
+    """
+    On shutdown, writes the table this process read from SQLite so the next cold start
+    memory-maps it — unless the data changed since (the snapshot would be ignored anyway).
+    """
+    with _cache_lock:
+        key, table = _cache['key'], _cache['unsaved']
+        _cache['unsaved'] = None
+    if table is None or not os.path.exists(key[0]):
+        return
+    try:
+        with closing(sqlite3.connect(key[0], timeout=5)) as conn:
+            current = _read_version(conn)
+    except sqlite3.Error:
+        return
+    if current == key[1]:
+        columnar.write_snapshot(table, current, key[0])
+
+
+def iter_properties(chunk_size=5000, columns=None):
+    """
+    Yields the properties in id order as DataFrames of at most chunk_size rows, reading
+    the table with a cursor so the whole dataset is never in memory at once.
+    """
+    columns = list(columns or COLUMNS)
+    select_cols = ", ".join(_quote(c) for c in ['id'] + columns)
+    with _connect() as conn:
+        cursor = conn.execute(f"SELECT {select_cols} FROM imoveis ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield pd.DataFrame.from_records(rows, columns=['id'] + columns, index='id')
+
+
+def search_query(text):
+    """
+    Turns free text into an FTS5 query: every word must appear, as a word prefix (single
+    characters as whole words), with accents ignored. A plural "s" after a vowel is
+    dropped (varandas -> varanda*). Returns '' when nothing searchable is left.
+    """
+    terms = [t.lower() for t in re.findall(r"\w+", text or "")]
+    terms = [t for t in terms if t not in SEARCH_STOPWORDS] or terms
+    terms = [t[:-1] if len(t) > 3 and t.endswith('s') and t[-2] in 'aeiouáéíóúâêôãõ' else t for t in terms]
+    return " ".join(f'"{t}"*' if len(t) > 1 else f'"{t}"' for t in dict.fromkeys(terms))
+
+
+def _search_condition(search):
+    """WHERE condition restricting imoveis to the rows matching search (no ranking)."""
+    return "imoveis.id IN (SELECT rowid FROM imoveis_busca WHERE imoveis_busca MATCH ?)", [search_query(search)]
+
+
+def _search_ranking(search):
+    """JOIN adding busca.relevancia, the bm25 score of each row matching search (lower is better)."""
+    weights = ", ".join(str(w) for w in SEARCH_WEIGHTS)
+    return (f"JOIN (SELECT rowid, bm25(imoveis_busca, {weights}) AS relevancia FROM imoveis_busca "
+            f"WHERE imoveis_busca MATCH ?) AS busca ON busca.rowid = imoveis.id", [search_query(search)])
+
+
+@metrics.timed("search_properties")
+def search_properties(text, limit=None):
+    """
+    Ids of the properties matching text (see search_query), most relevant first.
+    Uses the full-text index, so it does not scan the table.
+    """
+    if not search_query(text):
+        return []
+    join, params = _search_ranking(text)
+    sql = f"SELECT imoveis.id FROM imoveis {join} ORDER BY busca.relevancia, imoveis.id"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    with _connect() as conn:
+        return [row[0] for row in conn.execute(sql, params)]
+
+
+def query_properties(search=None, sort_by='id', ascending=True, limit=50, offset=0, only_with_url=False):
+    """
+    Returns (page, total): one page of properties matching search, sorted by sort_by,
+    and the total number of matches. Filtering, sorting and paging run in SQLite, so
+    only the requested page is materialized. search goes through the full-text index;
+    sort_by='relevancia' orders by how well it matches (best first when ascending).
+    """
+    if sort_by not in ('id', 'relevancia') and sort_by not in COLUMN_TYPES:
+        raise ValueError(f"Coluna de ordenação inválida: {sort_by}")
+    conditions, params = [], []
+    searching = bool(search and search_query(search))
+    if searching:
+        condition, condition_params = _search_condition(search)
+        conditions.append(condition)
+        params += condition_params
+    if only_with_url:
+        conditions.append("COALESCE(TRIM(\"URL\"), '') <> ''")
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+    direction = "ASC" if ascending else "DESC"
+    select_cols = ", ".join(_quote(c) for c in ['id'] + COLUMNS)
+    # O score bm25 só é calculado quando a ordenação é por relevância
+    if sort_by == 'relevancia' and searching:
+        # O JOIN já restringe às linhas encontradas: a condição da busca sai do WHERE
+        join, row_params = _search_ranking(search)
+        row_where = ("WHERE " + " AND ".join(conditions[1:])) if len(conditions) > 1 else ""
+        row_params += params[1:]
+        order = "busca.relevancia"
+    else:
+        join, row_where, row_params = "", where, list(params)
+        order = _quote('id' if sort_by == 'relevancia' else sort_by)
+    with _connect() as conn:
+        if searching and len(conditions) == 1:
+            # Só a busca: o índice de texto sabe quantas linhas casam sem tocar na tabela
+            total = conn.execute("SELECT COUNT(*) FROM imoveis_busca WHERE imoveis_busca MATCH ?", params).fetchone()[0]
+        else:
+            total = conn.execute(f"SELECT COUNT(*) FROM imoveis {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT {select_cols} FROM imoveis {join} {row_where} "
+            f"ORDER BY {order} {direction}, id {direction} LIMIT ? OFFSET ?",
+            row_params + [int(limit), int(offset)],
+        ).fetchall()
+    return _frame_from_rows(rows), total
+
+
+def add_listener(callback):
+    """
+    Registers callback(event, property_id, record, version), called after every committed write.
+
+    event is "insert", "update" or "delete" (record is the full row, or None for deletes),
+    or "reset" when the whole table was replaced (property_id and record are None).
+    version is the data version after the write; listeners that see a gap must rebuild.
+    """
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+def remove_listener(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def _notify(events, version):
+    # Called with _write_lock held, so listeners see writes in commit order
+    for callback in list(_listeners):
+        for event, property_id, record in events:
+            try:
+                callback(event, property_id, record, version)
+            except Exception:
+                logger.exception("Erro em listener de dados (%s %s)", event, property_id)
+
+
+class DerivedIndex:
+    """
+    Base for in-memory structures derived from the store (spatial, statistics, ...).
+
+    Subclasses implement rebuild(df) and apply(event, property_id, record). Writes made
+    through this module are applied incrementally as they happen; anything else (another
+    process, a missed event) is caught by current(), which rebuilds when the data version
+    moved. apply must be idempotent: the same event may arrive right after a rebuild.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.lock = threading.RLock()
+        add_listener(self._on_write)
+
+    def rebuild(self, df):
+        raise NotImplementedError
+
+    def apply(self, event, property_id, record):
+        raise NotImplementedError
+
+    def _on_write(self, event, property_id, record, version):
+        with self.lock:
+            if self.version is None:
+                return
+            if event == "reset" or version not in (self.version, self.version + 1):
+                self.version = None  # Out of sync; rebuilt on next access
+                return
+            self.apply(event, property_id, record)
+            self.version = version
+
+    def current(self):
+        """Returns self, rebuilt first if it is behind the store."""
+        with self.lock:
+            if self.version is None or self.version != data_version():
+                df, version = load_data_versioned()
+                self.rebuild(df)
+                self.version = version
+            return self
+
+
+def _fetch_record(conn, property_id):
+    select_cols = ", ".join(_quote(c) for c in ['id', 'versao'] + COLUMNS)
+    row = conn.execute(f"SELECT {select_cols} FROM imoveis WHERE id = ?", (int(property_id),)).fetchone()
+    if row is None:
+        return None
+    return dict(zip(['id', 'versao'] + COLUMNS, row))
+
+
+@metrics.timed("save_data")
 def save_data(df):
+    """Replaces the whole store with df. Prefer the per-record functions below."""
     # Garantir que a coluna URL seja string
     if 'URL' in df.columns:
-        df['URL'] = df['URL'].astype(str)
-    df.to_csv(DATA_FILE, index=False)
+        df['URL'] = df['URL'].fillna('').astype(str)
+    records = df.to_dict('records')
+    with_ids = df.index.name == 'id'
+    rows = [
+        ([int(idx)] if with_ids else []) + _record_values(record)
+        for idx, record in zip(df.index, records)
+    ]
+    with _write_lock:
+        with _connect() as conn:
+            # Substituição completa: o índice de busca é reconstruído de uma vez no fim, em
+            # vez de atualizado linha a linha pelos gatilhos (tudo na mesma transação)
+            conn.execute("BEGIN")
+            for name in _search_triggers():
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute("DELETE FROM imoveis")
+            _insert_rows(conn, rows, with_ids=with_ids)
+            conn.execute("INSERT INTO imoveis_busca (imoveis_busca) VALUES ('rebuild')")
+            for name, body in _search_triggers().items():
+                conn.execute(f"CREATE TRIGGER {name} {body}")
+            version = _bump_version(conn)
+        _notify([("reset", None, None)], version)
+
+
+def get_property(property_id):
+    """
+    Returns a single property as a dict or None. Besides the columns it has "id" and
+    "versao", the row version to pass back as expected_version when editing it.
+    """
+    with _connect() as conn:
+        return _fetch_record(conn, property_id)
+
+
+def insert_property(record):
+    """Appends a single property and returns its new id."""
+    with _write_lock:
+        with _connect() as conn:
+            cur = conn.execute(
+                f"INSERT INTO imoveis ({', '.join(_quote(c) for c in COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in COLUMNS)})",
+                _record_values(record),
+            )
+            property_id = cur.lastrowid
+            version = _bump_version(conn)
+            new_record = _fetch_record(conn, property_id)
+        _notify([("insert", property_id, new_record)], version)
+        return property_id
+
+
+def insert_properties(records):
+    """
+    Appends many properties in a single transaction (one data version) and returns
+    their new ids, in order. Use it for batches; insert_property for single records.
+    """
+    records = list(records)
+    if not records:
+        return []
+    sql = (f"INSERT INTO imoveis ({', '.join(_quote(c) for c in COLUMNS)}) "
+           f"VALUES ({', '.join('?' for _ in COLUMNS)})")
+    with _write_lock:
+        with _connect() as conn:
+            ids = [conn.execute(sql, _record_values(record)).lastrowid for record in records]
+            version = _bump_version(conn)
+            select_cols = ", ".join(_quote(c) for c in ['id', 'versao'] + COLUMNS)
+            rows = conn.execute(f"SELECT {select_cols} FROM imoveis WHERE id BETWEEN ? AND ? ORDER BY id",
+                                (ids[0], ids[-1])).fetchall()
+        events = [("insert", row[0], dict(zip(['id', 'versao'] + COLUMNS, row))) for row in rows]
+        _notify(events, version)
+        return ids
+
+
+def _check_conflict(conn, property_id, expected_version):
+    """Raises ConflictError if the row exists with a version other than expected_version."""
+    row = conn.execute("SELECT versao FROM imoveis WHERE id = ?", (int(property_id),)).fetchone()
+    if row is not None and row[0] != expected_version:
+        raise ConflictError(property_id, expected_version, row[0])
+
+
+def update_property(property_id, changes, expected_version=None):
+    """
+    Updates only the given fields of one property. Returns False if the id does not exist.
+    With expected_version, raises ConflictError if someone else changed the row meanwhile.
+    """
+    expected = None if expected_version is None else {property_id: expected_version}
+    return update_properties({property_id: changes}, expected) > 0 or get_property(property_id) is not None
+
+
+def update_properties(changes_by_id, expected_versions=None):
+    """
+    Applies {id: {coluna: valor}} in a single transaction. Returns how many rows changed.
+    expected_versions ({id: versao}) makes it all-or-nothing: any mismatch raises
+    ConflictError and nothing is written.
+    """
+    expected_versions = expected_versions or {}
+    events = []
+    with _write_lock:
+        with _connect() as conn:
+            for property_id, changes in changes_by_id.items():
+                changes = {col: value for col, value in changes.items() if col in COLUMN_TYPES}
+                if not changes:
+                    continue
+                assignments = ", ".join(f"{_quote(col)} = ?" for col in changes)
+                values = [_clean_value(v) for v in changes.values()] + [int(property_id)]
+                condition = "id = ?"
+                expected = expected_versions.get(property_id)
+                if expected is not None:
+                    condition += " AND versao = ?"
+                    values.append(int(expected))
+                cur = conn.execute(f"UPDATE imoveis SET {assignments}, versao = versao + 1 WHERE {condition}", values)
+                if cur.rowcount:
+                    events.append(("update", int(property_id), _fetch_record(conn, property_id)))
+                elif expected is not None:
+                    _check_conflict(conn, property_id, expected)
+            if not events:
+                return 0
+            version = _bump_version(conn)
+        _notify(events, version)
+    return len(events)
+
+
+def delete_property(property_id, expected_version=None):
+    """
+    Deletes one property. Returns False if the id does not exist.
+    With expected_version, raises ConflictError if someone else changed the row meanwhile.
+    """
+    with _write_lock:
+        with _connect() as conn:
+            if expected_version is None:
+                cur = conn.execute("DELETE FROM imoveis WHERE id = ?", (int(property_id),))
+            else:
+                cur = conn.execute("DELETE FROM imoveis WHERE id = ? AND versao = ?",
+                                   (int(property_id), int(expected_version)))
+            if cur.rowcount == 0:
+                if expected_version is not None:
+                    _check_conflict(conn, property_id, expected_version)
+                return False
+            version = _bump_version(conn)
+        _notify([("delete", int(property_id), None)], version)
+        return True
+
 
+if __name__ == "__main__":
+    import argparse
 
+    parser = argparse.ArgumentParser(description="Ferramentas do banco de imóveis")
+    parser.add_argument("--migrate", metavar="CSV", help="Importa um arquivo CSV legado para o banco")
+    parser.add_argument("--snapshot", action="store_true",
+                        help=f"Gera o snapshot colunar {columnar.SNAPSHOT_FILE} (requer pyarrow)")
+    args = parser.parse_args()
 
+    if args.migrate:
+        print(f"{migrate_csv(args.migrate)} imóveis importados de {args.migrate} para {DB_FILE}")
+    if args.snapshot:
+        if not columnar.available():
+            parser.error("pyarrow não está instalado")
+        version = save_snapshot()
+        print(f"{len(load_data())} imóveis em {columnar.SNAPSHOT_FILE} (versão {version})")
+    if not (args.migrate or args.snapshot):
+        parser.print_help()
@@ -0,0 +1,299 @@
+"""
+Duplicate-listing detection.
+
+The same apartment is often listed on several sites with a slightly different address.
+DuplicateIndex keeps, for every property, hash-table keys for its canonical URL and its
+normalized street + number, plus a fine coordinate grid, so checking a new record only
+looks at the properties sharing one of its keys or cells. Address and coordinate matches
+only count when size and price agree within a tolerance (two units in the same building
+are not duplicates).
+
+    python dedup.py             # lista os pares de possíveis duplicados do banco
+"""
+import functools
+import hashlib
+import math
+import re
+import threading
+from urllib.parse import parse_qsl, urlencode, urldefrag, urlsplit
+
+from data import DerivedIndex
+from spatial import haversine_km
+from utils import normalize_address
+
+PRICE = "Preço do Aluguel (R$)"
+SIZE = "Tamanho (m²)"
+
+# Células da grade de coordenadas (~55 m de latitude) e distância máxima entre duplicados
+CELL_SIZE = 0.0005
+NEAR_DISTANCE_M = 30
+# Diferença relativa aceita entre tamanhos/preços de anúncios do mesmo imóvel
+SIZE_TOLERANCE = 0.08
+PRICE_TOLERANCE = 0.10
+
+# Parâmetros de rastreamento que não mudam a página do anúncio
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|ref|referrer|source|origem|xtor|mibextid)$", re.IGNORECASE)
+_NUMBER_WORDS = {"n", "no", "num", "numero"}
+
+# Chaves recentes em cache: o mesmo registro é consultado e depois indexado (importação, cadastro)
+KEY_CACHE_SIZE = 65536
+
+REASONS = {"url": "mesma URL", "endereco": "mesmo endereço", "coordenadas": "coordenadas próximas"}
+
+
+@functools.lru_cache(maxsize=KEY_CACHE_SIZE)
+def canonical_url(url):
+    """
+    URL as a duplicate key: no scheme, "www."/"m." prefix, fragment, trailing slash or
+    tracking parameters; remaining query parameters sorted.
+    """
+    url = urldefrag(str(url or "").strip())[0]
+    if not url:
+        return ""
+    parts = urlsplit(url if "://" in url else "//" + url)
+    host = parts.netloc.lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _TRACKING_PARAMS.match(k))
+    key = host + parts.path.rstrip("/")
+    return key + ("?" + urlencode(query) if query else "")
+
+
+@functools.lru_cache(maxsize=KEY_CACHE_SIZE)
+def address_key(address):
+    """
+    Normalized "street number" of an address (neighbourhood, city and complement
+    dropped), or the whole normalized address when no number is found.
+    """
+    # Só os dois primeiros trechos com conteúdo interessam (rua e, às vezes, o número)
+    segments = []
+    for part in re.split(r",|\s-\s", str(address or "")):
+        part = normalize_address(part)
+        if part:
+            segments.append(part)
+            if len(segments) == 2:
+                break
+    if not segments:
+        return ""
+    street = segments[0].split()
+    number = None
+    if street[-1].isdigit() and len(street) > 1:
+        number = street.pop()
+    elif len(segments) > 1:
+        number = next((token for token in segments[1].split() if token.isdigit()), None)
+    while len(street) > 1 and street[-1] in _NUMBER_WORDS:
+        street.pop()
+    if number is None:
+        return normalize_address(address)
+    return " ".join(street) + " " + number
+
+
+def _address_hash(address):
+    key = address_key(address)
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest() if key else None
+
+
+def _number(value):
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) or value <= 0 else value
+
+
+def _coordinate(value):
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def _close(a, b, tolerance):
+    """True/False when both values are known, None otherwise."""
+    if a is None or b is None:
+        return None
+    return abs(a - b) <= tolerance * max(a, b)
+
+
+class DuplicateTable:
+    """
+    Hash tables by canonical URL and address key plus a coordinate grid over a set of
+    records, and the matching rules between them. Filled by hand with add(); see
+    DuplicateIndex for the one that follows the store.
+    """
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.rows = {}
+        self.by_url = {}
+        self.by_address = {}
+        self.cells = {}
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def _row(self, record):
+        lat, lon = _coordinate(record.get("Latitude")), _coordinate(record.get("Longitude"))
+        return {
+            "url": canonical_url(record.get("URL")) or None,
+            "endereco": _address_hash(record.get("Endereço")),
+            "coords": (lat, lon) if lat is not None and lon is not None else None,
+            SIZE: _number(record.get(SIZE)),
+            PRICE: _number(record.get(PRICE)),
+            "Quartos": _number(record.get("Quartos")),
+        }
+
+    def _add(self, property_id, record):
+        row = self._row(record)
+        self.rows[property_id] = row
+        if row["url"]:
+            self.by_url.setdefault(row["url"], set()).add(property_id)
+        if row["endereco"]:
+            self.by_address.setdefault(row["endereco"], set()).add(property_id)
+        if row["coords"]:
+            self.cells.setdefault(self._cell(*row["coords"]), set()).add(property_id)
+
+    def _discard(self, table, key, property_id):
+        members = table.get(key)
+        if members is not None:
+            members.discard(property_id)
+            if not members:
+                del table[key]
+
+    def _remove(self, property_id):
+        row = self.rows.pop(property_id, None)
+        if row is None:
+            return
+        if row["url"]:
+            self._discard(self.by_url, row["url"], property_id)
+        if row["endereco"]:
+            self._discard(self.by_address, row["endereco"], property_id)
+        if row["coords"]:
+            self._discard(self.cells, self._cell(*row["coords"]), property_id)
+
+    def add(self, key, record):
+        """Adds record under key (any hashable id)."""
+        with self.lock:
+            self._remove(key)
+            self._add(key, record)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _near(self, coords):
+        """Ids in the cell of coords and its 8 neighbours (distance checked by _match)."""
+        cx, cy = self._cell(*coords)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                yield from self.cells.get((cx + dx, cy + dy), ())
+
+    def _match(self, row, other_id):
+        """List of reasons why other_id looks like the same property as row (empty if not)."""
+        other = self.rows[other_id]
+        if row["url"] and row["url"] == other["url"]:
+            return ["url"]
+        size = _close(row[SIZE], other[SIZE], SIZE_TOLERANCE)
+        price = _close(row[PRICE], other[PRICE], PRICE_TOLERANCE)
+        rooms = None if row["Quartos"] is None or other["Quartos"] is None else row["Quartos"] == other["Quartos"]
+        if False in (size, price, rooms):
+            return []
+        reasons = []
+        if row["endereco"] and row["endereco"] == other["endereco"]:
+            reasons.append("endereco")
+        # Coordenadas sozinhas são fracas (prédios vizinhos): exigem tamanho e preço conhecidos
+        if (row["coords"] and other["coords"] and size and price
+                and haversine_km(*row["coords"], *other["coords"]) * 1000 <= NEAR_DISTANCE_M):
+            reasons.append("coordenadas")
+        return reasons
+
+    def _candidates(self, row, exclude_id=None):
+        ids = set()
+        if row["url"]:
+            ids |= self.by_url.get(row["url"], set())
+        if row["endereco"]:
+            ids |= self.by_address.get(row["endereco"], set())
+        if row["coords"]:
+            ids.update(self._near(row["coords"]))
+        ids.discard(exclude_id)
+        found = []
+        for other_id in ids:
+            reasons = self._match(row, other_id)
+            if reasons:
+                found.append({"id": other_id, "motivos": reasons})
+        # URL first, then the ones with more evidence
+        found.sort(key=lambda c: ("url" not in c["motivos"], -len(c["motivos"]), c["id"]))
+        return found
+
+    def candidates(self, record, exclude_id=None):
+        """
+        Records in the table that look like the same listing as record:
+        [{"id", "motivos": ["url" | "endereco" | "coordenadas", ...]}], strongest first.
+        """
+        with self.lock:
+            return self._candidates(self._row(record), exclude_id)
+
+    def merge_candidates(self):
+        """
+        Batch pass over the whole table: every pair (id, duplicate_id, motivos) with
+        id < duplicate_id, found through the same keys as candidates().
+        """
+        pairs = []
+        with self.lock:
+            for property_id, row in self.rows.items():
+                for candidate in self._candidates(row, exclude_id=property_id):
+                    if candidate["id"] > property_id:
+                        pairs.append((property_id, candidate["id"], candidate["motivos"]))
+        pairs.sort()
+        return pairs
+
+
+class DuplicateIndex(DuplicateTable, DerivedIndex):
+    """DuplicateTable over the whole store, maintained incrementally on every write (see data.DerivedIndex)."""
+
+    def __init__(self, cell_size=CELL_SIZE):
+        DuplicateTable.__init__(self, cell_size)
+        DerivedIndex.__init__(self)
+
+    def rebuild(self, df):
+        self._reset()
+        for property_id, record in zip(df.index, df.to_dict("records")):
+            self._add(int(property_id), record)
+
+    def apply(self, event, property_id, record):
+        self._remove(property_id)
+        if event != "delete" and record is not None:
+            self._add(property_id, record)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def duplicate_index():
+    """Process-wide DuplicateIndex over the store, up to date with the latest writes."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DuplicateIndex()
+    return _index.current()
+
+
+if __name__ == "__main__":
+    from data import get_property
+
+    pairs = duplicate_index().merge_candidates()
+    for property_id, duplicate_id, reasons in pairs:
+        first, second = get_property(property_id), get_property(duplicate_id)
+        print(f"{property_id} x {duplicate_id} ({', '.join(REASONS[r] for r in reasons)}): "
+              f"{first['Endereço']} | {second['Endereço']}")
+    print(f"{len(pairs)} par(es) de possíveis duplicados")
@@ -0,0 +1,118 @@
+import copy
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from data import data_version, load_data_versioned
+
+PRICE = "Preço do Aluguel (R$)"
+INDEXED_COLUMNS = [PRICE, "Quartos", "Qualidade", "Latitude", "Longitude"]
+
+# Quantos mapas construídos manter em memória (por assinatura de filtro)
+MAP_CACHE_SIZE = 16
+
+
+class PropertyIndex:
+    """
+    Sorted, array-backed indexes over a snapshot of the properties table.
+
+    Each indexed column keeps its values sorted together with the row positions, so a
+    range is two binary searches. A multi-column query starts from the most selective
+    range and only checks the other columns on those candidates, so its cost grows with
+    the size of the answer instead of the size of the table.
+    """
+
+    def __init__(self, df, version=None):
+        self.df = df
+        self.version = version
+        self.sorted = {}
+        for col in INDEXED_COLUMNS:
+            values = df[col].to_numpy(dtype=float) if col in df.columns else np.full(len(df), np.nan)
+            order = np.argsort(values, kind="stable")
+            self.sorted[col] = (values[order], order, values)
+
+    def __len__(self):
+        return len(self.df)
+
+    def bounds(self, col):
+        """(min, max) of a column ignoring missing values, or None if it has none."""
+        values = self.sorted[col][0]
+        finite = values[~np.isnan(values)]
+        if finite.size == 0:
+            return None
+        return finite[0], finite[-1]
+
+    def range_positions(self, col, low, high):
+        sorted_values, order, _ = self.sorted[col]
+        start = np.searchsorted(sorted_values, low, side="left")
+        end = np.searchsorted(sorted_values, high, side="right")
+        return order[start:end]
+
+    def query(self, ranges):
+        """Row positions matching every {coluna: (min, max)} range (inclusive), in table order."""
+        if not ranges:
+            return np.arange(len(self.df))
+        spans = {}
+        for col, (low, high) in ranges.items():
+            sorted_values = self.sorted[col][0]
+            spans[col] = (np.searchsorted(sorted_values, high, side="right")
+                          - np.searchsorted(sorted_values, low, side="left"))
+        driver = min(spans, key=spans.get)
+        positions = self.range_positions(driver, *ranges[driver])
+        for col, (low, high) in ranges.items():
+            if col == driver or positions.size == 0:
+                continue
+            values = self.sorted[col][2][positions]
+            positions = positions[(values >= low) & (values <= high)]
+        return np.sort(positions)
+
+    def filter(self, ranges):
+        return self.df.iloc[self.query(ranges)]
+
+
+_index_lock = threading.Lock()
+_index = None
+_map_cache = OrderedDict()
+
+
+def property_index():
+    """Process-wide PropertyIndex, rebuilt only when the store's data version changes."""
+    global _index
+    version = data_version()
+    with _index_lock:
+        if _index is not None and _index.version == version:
+            return _index
+    # Frame and version from the same read: a write in between can't mislabel the index
+    df, version = load_data_versioned()
+    index = PropertyIndex(df, version)
+    with _index_lock:
+        # Another session may have built a newer one meanwhile (versions only grow)
+        if _index is None or _index.version < version:
+            _index = index
+            _map_cache.clear()
+    return index
+
+
+def filter_signature(ranges, *extra):
+    """Hashable key for a filter state, used to memoize what is rendered for it."""
+    return tuple(sorted((col, float(low), float(high)) for col, (low, high) in ranges.items())) + extra
+
+
+def cached_map(index, signature, build):
+    """
+    Returns the map built for this filter signature, calling build() only on a miss.
+    The cache keeps a never-rendered map and hands out deep copies: st_folium renders
+    the map it gets, and rendering a folium Map again appends its scripts once more.
+    """
+    key = (index.version, signature)
+    with _index_lock:
+        if key in _map_cache:
+            _map_cache.move_to_end(key)
+            return copy.deepcopy(_map_cache[key])
+    m = build()
+    with _index_lock:
+        _map_cache[key] = m
+        while len(_map_cache) > MAP_CACHE_SIZE:
+            _map_cache.popitem(last=False)
+    return copy.deepcopy(m)
@@ -0,0 +1,147 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import metrics
+
+# Timeouts (segundos) configuráveis por variável de ambiente
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+RETRY_STATUS = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+POOL_SIZE = 16
+
+# None usa a API pública da Groq; mock_servers.py serve uma imitação local
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL")
+
+_session = None
+_session_lock = threading.Lock()
+_groq_clients = {}
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def pooled_session(pool_size=POOL_SIZE):
+    """A new keep-alive Session that keeps up to pool_size connections per host."""
+    import requests  # adiado: páginas que não fazem chamadas HTTP não pagam o import
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """Process-wide pooled Session, so repeated calls reuse TCP/TLS connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = pooled_session()
+        return _session
+
+
+def retry_delay(response, attempt):
+    """Seconds to wait before retrying: Retry-After if sent, else exponential backoff with full jitter."""
+    header = response.headers.get("Retry-After") if response is not None else None
+    if header:
+        try:
+            return min(BACKOFF_MAX, float(header))
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def record(endpoint, seconds, ok=True, retried=False):
+    """Adds one call to the endpoint's latency/error counters."""
+    with _stats_lock:
+        stats = _stats.setdefault(endpoint, {"requests": 0, "errors": 0, "retries": 0, "total_s": 0.0, "max_s": 0.0})
+        stats["requests"] += 1
+        stats["errors"] += 0 if ok else 1
+        stats["retries"] += 1 if retried else 0
+        stats["total_s"] += seconds
+        stats["max_s"] = max(stats["max_s"], seconds)
+    metrics.observe(f"http {endpoint}", seconds, ok=ok)
+
+
+@contextmanager
+def track(endpoint):
+    """Times the block as one call to endpoint; an exception counts as an error."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        record(endpoint, time.perf_counter() - start, ok=False)
+        raise
+    record(endpoint, time.perf_counter() - start)
+
+
+def endpoint_stats():
+    """{endpoint: {requests, errors, retries, mean_ms, max_ms}} since the process started."""
+    with _stats_lock:
+        return {
+            endpoint: {
+                "requests": stats["requests"],
+                "errors": stats["errors"],
+                "retries": stats["retries"],
+                "mean_ms": 1000 * stats["total_s"] / stats["requests"] if stats["requests"] else 0.0,
+                "max_ms": 1000 * stats["max_s"],
+            }
+            for endpoint, stats in _stats.items()
+        }
+
+
+def request(method, url, endpoint=None, session=None, retries=MAX_RETRIES, timeout=None,
+            retry_status=RETRY_STATUS, throttle=None, **kwargs):
+    """
+    Sends a request through the pooled session, retrying connection errors, timeouts
+    and retry_status responses with jittered exponential backoff (honouring Retry-After).
+    throttle, if given, is called before every attempt (e.g. a rate limiter's acquire).
+
+    Every attempt is counted under endpoint (default: the URL's host). Returns the last
+    response, whatever its status; raises the last exception if every attempt failed.
+    """
+    import requests
+
+    endpoint = endpoint or urlparse(url).netloc
+    http = session if session is not None else get_session()
+    timeout = timeout if timeout is not None else (CONNECT_TIMEOUT, READ_TIMEOUT)
+    for attempt in range(retries + 1):
+        if throttle is not None:
+            throttle()
+        start = time.perf_counter()
+        response = None
+        try:
+            response = http.request(method, url, timeout=timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            record(endpoint, time.perf_counter() - start, ok=False, retried=attempt > 0)
+            if attempt == retries:
+                raise
+        else:
+            ok = response.status_code < 400
+            record(endpoint, time.perf_counter() - start, ok=ok, retried=attempt > 0)
+            if response.status_code not in retry_status or attempt == retries:
+                return response
+        time.sleep(retry_delay(response, attempt))
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def groq_client(api_key):
+    """The Groq client for api_key, created once and reused (it keeps its own connection pool)."""
+    from groq import Groq  # adiado: só carrega quando o LLM é realmente chamado
+
+    with _session_lock:
+        if api_key not in _groq_clients:
+            _groq_clients[api_key] = Groq(api_key=api_key, base_url=GROQ_BASE_URL,
+                                             timeout=READ_TIMEOUT * 4, max_retries=MAX_RETRIES)
+        return _groq_clients[api_key]
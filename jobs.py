@@ -0,0 +1,236 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from data import get_connection, get_property, update_property
+
+logger = logging.getLogger(__name__)
+
+# Estados de uma tarefa
+PENDING = "pendente"
+RUNNING = "executando"
+DONE = "concluido"
+FAILED = "erro"
+
+KIND_GEOCODE = "geocode"
+KIND_EXTRACTION = "extracao"
+
+JOB_WORKERS = 2
+# Tarefas "executando" sem atualização há mais que isso são de um processo que morreu
+JOB_STALE_AFTER = 300
+
+_executor = None
+_executor_lock = threading.Lock()
+_geocode_limiter = None
+
+
+def _get_executor():
+    """
+    Starts the worker pool on first use and re-queues jobs left behind by a previous run
+    and geocodes that failed on a transient error (see retry_failed_geocodes).
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            return _executor
+        _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="jobs")
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET estado = ?, atualizado_em = ? WHERE estado = ? AND atualizado_em < ?",
+                (PENDING, time.time(), RUNNING, time.time() - JOB_STALE_AFTER),
+            )
+        pending = [row[0] for row in conn.execute("SELECT id FROM jobs WHERE estado = ? ORDER BY id", (PENDING,))]
+    finally:
+        conn.close()
+    for job_id in pending:
+        _executor.submit(_run, job_id)
+    retry_failed_geocodes()
+    return _executor
+
+
+def _update_job(job_id, state, result=None, error=None, only_if=None):
+    conn = get_connection()
+    try:
+        with conn:
+            sql = "UPDATE jobs SET estado = ?, resultado = ?, erro = ?, atualizado_em = ? WHERE id = ?"
+            params = [state, None if result is None else json.dumps(result, ensure_ascii=False), error, time.time(), job_id]
+            if only_if is not None:
+                sql += " AND estado = ?"
+                params.append(only_if)
+            return conn.execute(sql, params).rowcount > 0
+    finally:
+        conn.close()
+
+
+def _get_geocode_limiter():
+    """One bucket for every geocode job in the process: Nominatim allows 1 req/s."""
+    global _geocode_limiter
+    with _executor_lock:
+        if _geocode_limiter is None:
+            from batch_geocode import TokenBucket
+
+            _geocode_limiter = TokenBucket()
+        return _geocode_limiter
+
+
+def _geocode_job(params, property_id):
+    from batch_geocode import geocode_one
+    from utils import get_cached_geocode, store_cached_geocode
+
+    address = params["endereco"]
+    coords = get_cached_geocode(address)
+    if coords is None:
+        coords = geocode_one(address, None, _get_geocode_limiter())
+        store_cached_geocode(address, *coords)
+    lat, lon = coords
+    if lat is None:
+        raise ValueError(f"Endereço não encontrado: {address}")
+    if property_id is not None:
+        record = get_property(property_id)
+        # The address may have been edited (and geocoded again) while this job waited
+        if record is not None and str(record["Endereço"]).strip() == address.strip():
+            update_property(property_id, {"Latitude": lat, "Longitude": lon})
+    return {"Latitude": lat, "Longitude": lon}
+
+
+def _extraction_job(params, property_id):
+    from scraper import extract_listing, fetch_page_html
+
+    html = fetch_page_html(params["url"])
+    if not html:
+        raise ValueError("Não foi possível carregar o conteúdo da página")
+    # The key is read here, never stored with the job
+    data = extract_listing(html, os.getenv("GROQ_API_KEY"), params["url"])
+    if not data:
+        raise ValueError("Não foi possível extrair os dados da página")
+    return data
+
+
+_HANDLERS = {
+    KIND_GEOCODE: _geocode_job,
+    KIND_EXTRACTION: _extraction_job,
+}
+
+
+def _run(job_id):
+    # Claiming the job atomically keeps two processes from running it twice
+    if not _update_job(job_id, RUNNING, only_if=PENDING):
+        return
+    job = get_job(job_id)
+    try:
+        result = _HANDLERS[job["tipo"]](job["parametros"], job["imovel_id"])
+    except Exception as e:
+        logger.warning("Tarefa %s (%s) falhou: %s", job_id, job["tipo"], e)
+        _update_job(job_id, FAILED, error=str(e))
+    else:
+        _update_job(job_id, DONE, result=result)
+
+
+def submit(kind, params, property_id=None):
+    """Queues a job of the given kind and returns its id; it runs in a background thread."""
+    if kind not in _HANDLERS:
+        raise ValueError(f"Tipo de tarefa desconhecido: {kind}")
+    now = time.time()
+    conn = get_connection()
+    try:
+        with conn:
+            job_id = conn.execute(
+                "INSERT INTO jobs (tipo, estado, imovel_id, parametros, criado_em, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, PENDING, property_id, json.dumps(params, ensure_ascii=False), now, now),
+            ).lastrowid
+    finally:
+        conn.close()
+    _get_executor().submit(_run, job_id)
+    return job_id
+
+
+def submit_geocode(address, property_id=None):
+    """Geocodes address in the background and, if property_id is given, fills its coordinates."""
+    return submit(KIND_GEOCODE, {"endereco": address}, property_id)
+
+
+def submit_extraction(url):
+    """Downloads url and extracts the listing fields in the background."""
+    return submit(KIND_EXTRACTION, {"url": url})
+
+
+def _job_from_row(row):
+    job = dict(zip(["id", "tipo", "estado", "imovel_id", "parametros", "resultado", "erro", "criado_em", "atualizado_em"], row))
+    job["parametros"] = json.loads(job["parametros"]) if job["parametros"] else {}
+    job["resultado"] = json.loads(job["resultado"]) if job["resultado"] else None
+    return job
+
+
+_SELECT = "SELECT id, tipo, estado, imovel_id, parametros, resultado, erro, criado_em, atualizado_em FROM jobs"
+
+
+def get_job(job_id):
+    """The job as a dict, or None if it does not exist."""
+    conn = get_connection()
+    try:
+        row = conn.execute(f"{_SELECT} WHERE id = ?", (int(job_id),)).fetchone()
+    finally:
+        conn.close()
+    return _job_from_row(row) if row else None
+
+
+def recent_jobs(limit=20):
+    """The most recent jobs, newest first."""
+    conn = get_connection()
+    try:
+        rows = conn.execute(f"{_SELECT} ORDER BY id DESC LIMIT ?", (int(limit),)).fetchall()
+    finally:
+        conn.close()
+    return [_job_from_row(row) for row in rows]
+
+
+def active_count():
+    """Number of jobs still waiting or running."""
+    conn = get_connection()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM jobs WHERE estado IN (?, ?)", (PENDING, RUNNING)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def failed_geocodes():
+    """
+    Failed geocode jobs of properties still without coordinates — only the latest
+    geocode job of each property, newest first.
+    """
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            f"{_SELECT} WHERE tipo = ? AND estado = ? "
+            "AND id = (SELECT MAX(id) FROM jobs AS j WHERE j.tipo = jobs.tipo AND j.imovel_id = jobs.imovel_id) "
+            "AND imovel_id IN (SELECT id FROM imoveis WHERE Latitude IS NULL OR Longitude IS NULL) "
+            "ORDER BY id DESC",
+            (KIND_GEOCODE, FAILED),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [_job_from_row(row) for row in rows]
+
+
+def retry_failed_geocodes():
+    """
+    Queues a new geocode, with the property's current address, for each failed_geocodes()
+    entry. Addresses the geocoder answered "not found" are left alone until they are
+    edited (or the negative cache expires). Returns the new job ids.
+    """
+    from utils import get_cached_geocode
+
+    job_ids = []
+    for job in failed_geocodes():
+        record = get_property(job["imovel_id"])
+        address = str(record["Endereço"]).strip() if record else ""
+        if not address or get_cached_geocode(address) == (None, None):
+            continue
+        job_ids.append(submit_geocode(address, job["imovel_id"]))
+    return job_ids
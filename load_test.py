@@ -0,0 +1,123 @@
+"""
+Load test of the whole ingestion path (fetch -> extract -> geocode -> save) against
+the local mock servers, with optional injected latency, errors and 429s.
+
+Runs in a scratch directory with its own imoveis.db and reports throughput, completion
+time percentiles, per-stage latencies, client retries and what the mock servers answered.
+
+    python load_test.py -n 200
+    python load_test.py -n 500 --fetch-workers 32 --latency 0.1 --jitter 0.2 --error-rate 0.05
+    python load_test.py -n 100 --max-rps 1 --services nominatim --geocode-rate 1
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from mock_servers import add_fault_arguments, faults_from_args, start_mock_server
+
+# Etapas do caminho de ingestão cujos tempos entram no relatório
+STAGES = ["fetch_page_html", "extract_property_data", "http groq", "http nominatim"]
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def run(count, base_url, fetch_workers, extract_workers, per_host_limit, geocode_rate):
+    """Pushes count synthetic listings through scraper.ingest_urls and returns the report."""
+    # Importados só aqui: leem NOMINATIM_URL/GROQ_BASE_URL e o diretório de trabalho ao carregar
+    import http_client
+    import metrics
+    from scraper import ingest_urls
+
+    urls = [f"{base_url}/anuncio/{i}" for i in range(count)]
+    finished = []
+    errors = Counter()
+    start = time.perf_counter()
+    for result in ingest_urls(urls, os.environ["GROQ_API_KEY"], fetch_workers=fetch_workers,
+                              extract_workers=extract_workers, per_host_limit=per_host_limit,
+                              geocode_rate=geocode_rate):
+        finished.append(time.perf_counter() - start)
+        if not result["ok"]:
+            errors[result["error"].split(":")[0]] += 1
+    elapsed = time.perf_counter() - start
+
+    succeeded = count - sum(errors.values())
+    stages = {row["operacao"]: row for row in metrics.summary() if row["operacao"] in STAGES}
+    return {
+        "anuncios": count,
+        "sucesso": succeeded,
+        "falhas": dict(errors),
+        "duracao_s": elapsed,
+        "vazao_por_s": succeeded / elapsed if elapsed else 0.0,
+        "conclusao_s": {
+            "p50": _percentile(finished, 0.5),
+            "p95": _percentile(finished, 0.95),
+            "p99": _percentile(finished, 0.99),
+            "max": max(finished, default=None),
+        },
+        "etapas_ms": {
+            name: {key: row[key] for key in ("chamadas", "erros", "p50_ms", "p95_ms", "p99_ms", "max_ms")}
+            for name, row in stages.items()
+        },
+        "http": http_client.endpoint_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da ingestão de anúncios com servidores simulados")
+    parser.add_argument("-n", "--count", type=int, default=100, help="Quantidade de anúncios")
+    parser.add_argument("--fetch-workers", type=int, default=16)
+    parser.add_argument("--extract-workers", type=int, default=4)
+    parser.add_argument("--per-host", type=int, default=4)
+    parser.add_argument("--geocode-rate", type=float, default=50.0,
+                        help="Geocodificações por segundo (o Nominatim público aceita 1)")
+    parser.add_argument("-o", "--output", help="Grava o relatório em JSON")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(faults=faults_from_args(args), seed=args.seed)
+    os.environ.update({
+        "NOMINATIM_URL": f"{base_url}/search",
+        "GROQ_BASE_URL": base_url,
+        "GROQ_API_KEY": "mock",
+    })
+    workdir = tempfile.mkdtemp(prefix="imoveis-carga-")
+    os.chdir(workdir)
+    try:
+        report = run(args.count, base_url, args.fetch_workers, args.extract_workers, args.per_host, args.geocode_rate)
+    finally:
+        server.shutdown()
+    report["servidor"] = {f"{service} {status}": n for (service, status), n in sorted(server.stats.items())}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    completion = report["conclusao_s"]
+    print(f"{report['sucesso']}/{report['anuncios']} anúncios em {report['duracao_s']:.1f} s "
+          f"({report['vazao_por_s']:.1f}/s)")
+    if completion["p50"] is not None:
+        print(f"Conclusão: p50 {completion['p50']:.2f} s, p95 {completion['p95']:.2f} s, "
+              f"p99 {completion['p99']:.2f} s, máx. {completion['max']:.2f} s")
+    for name, stage in report["etapas_ms"].items():
+        print(f"  {name:<24} {stage['chamadas']:>6} chamadas  p50 {stage['p50_ms']:8.1f} ms  "
+              f"p95 {stage['p95_ms']:8.1f} ms  p99 {stage['p99_ms']:8.1f} ms  erros {stage['erros']}")
+    for error, n in report["falhas"].items():
+        print(f"  FALHA {error}: {n}")
+    print("Servidor: " + ", ".join(f"{key}: {n}" for key, n in report["servidor"].items()))
+    print(f"Banco de teste: {os.path.join(workdir, 'imoveis.db')}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+import metrics
+
+# Até MARKER_LIMIT imóveis, um marcador completo (com popup) por imóvel.
+# Até CLUSTER_LIMIT, marcadores agrupados desenhados no navegador a partir de um array compacto.
+# Acima disso, apenas o mapa de calor agregado.
+MARKER_LIMIT = 300
+CLUSTER_LIMIT = 20000
+
+MODE_AUTO = "Automático"
+MODE_MARKERS = "Marcadores"
+MODE_CLUSTER = "Agrupado"
+MODE_HEATMAP = "Mapa de calor"
+MAP_MODES = [MODE_AUTO, MODE_MARKERS, MODE_CLUSTER, MODE_HEATMAP]
+
+# Builds each point client-side from [lat, lon, qualidade, id]; details are shown by the page on click
+_CLUSTER_CALLBACK = """
+function (row) {
+    var color = row[2] >= 4 ? "#2a81cb" : (row[2] >= 2 ? "#2aad27" : "#cb2b3e");
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+        radius: 8, color: color, fillColor: color, fillOpacity: 0.8, weight: 1
+    });
+    marker.bindTooltip("Imóvel #" + row[3] + " - " + row[2] + " estrela(s)");
+    return marker;
+};
+"""
+
+
+def quality_color(qualidade):
+    return "blue" if qualidade >= 4 else "green" if qualidade >= 2 else "red"
+
+
+def _shown(value, fmt="{:.0f}"):
+    # Campos não informados (ex.: imóveis importados em lote) aparecem como "-"
+    return "-" if value is None or pd.isna(value) else fmt.format(value)
+
+
+def popup_html(row):
+    # Build popup HTML with URL if available
+    html = f"""
+        <b>Endereço:</b> {row["Endereço"]}<br>
+        <b>Preço:</b> R$ {_shown(row["Preço do Aluguel (R$)"], "{:,}")}<br>
+        <b>Quartos:</b> {_shown(row["Quartos"])}<br>
+        <b>Banheiros:</b> {_shown(row["Banheiros"])}<br>
+        <b>Qualidade:</b> {_shown(row["Qualidade"])} estrelas
+    """
+
+    # Add URL to popup if available
+    if "URL" in row and pd.notna(row["URL"]) and row["URL"] != "":
+        html += f'<br><b>URL:</b> <a href="{row["URL"]}" target="_blank">Ver anúncio</a>'
+    return html
+
+
+def resolve_mode(mode, count):
+    """Picks the rendering mode for `count` properties when mode is automatic."""
+    if mode != MODE_AUTO:
+        return mode
+    if count <= MARKER_LIMIT:
+        return MODE_MARKERS
+    if count <= CLUSTER_LIMIT:
+        return MODE_CLUSTER
+    return MODE_HEATMAP
+
+
+@metrics.timed("build_map")
+def build_map(df, mode=MODE_AUTO, reference=None):
+    """
+    Builds the folium map for df, choosing a representation that scales with its size.
+    reference=(lat, lon, raio_km) draws the point and radius of a "near point" filter.
+    """
+    # folium só é carregado quando um mapa é de fato construído (e não a cada troca de página)
+    import folium
+    from folium.plugins import FastMarkerCluster, HeatMap
+
+    df = df.dropna(subset=["Latitude", "Longitude"])
+    # Centralizar o mapa na média das coordenadas dos imóveis filtrados
+    map_center = [df["Latitude"].mean(), df["Longitude"].mean()]
+    m = folium.Map(location=map_center, zoom_start=12, prefer_canvas=True)
+    mode = resolve_mode(mode, len(df))
+
+    if reference is not None:
+        lat, lon, km = reference
+        folium.Circle(location=[lat, lon], radius=km * 1000, color="purple", fill=False).add_to(m)
+        folium.Marker(location=[lat, lon], tooltip="Ponto de referência",
+                      icon=folium.Icon(color="purple", icon="star")).add_to(m)
+
+    if mode == MODE_MARKERS:
+        for row in df.to_dict("records"):
+            folium.Marker(
+                location=[row["Latitude"], row["Longitude"]],
+                popup=folium.Popup(popup_html(row), max_width=300),
+                icon=folium.Icon(color=quality_color(row["Qualidade"]))
+            ).add_to(m)
+    elif mode == MODE_CLUSTER:
+        points = np.column_stack([
+            df["Latitude"].to_numpy(dtype=float).round(6),
+            df["Longitude"].to_numpy(dtype=float).round(6),
+            df["Qualidade"].fillna(0).to_numpy(dtype=int),
+            df.index.to_numpy(dtype=int),
+        ]).tolist()
+        FastMarkerCluster(points, callback=_CLUSTER_CALLBACK).add_to(m)
+    else:
+        HeatMap(df[["Latitude", "Longitude"]].to_numpy(dtype=float).round(5).tolist(), radius=12).add_to(m)
+    return m
+
+
+def property_at(df, lat, lon, tolerance=1e-5):
+    """Returns the row of df at the clicked coordinates, or None."""
+    if df.empty or lat is None or lon is None:
+        return None
+    distance = (df["Latitude"] - lat).abs() + (df["Longitude"] - lon).abs()
+    nearest = distance.idxmin()
+    if distance[nearest] > tolerance:
+        return None
+    return df.loc[nearest]
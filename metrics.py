@@ -0,0 +1,181 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Limites (segundos) dos buckets dos histogramas exportados no formato Prometheus
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Amostras mais recentes guardadas por operação para os percentis exatos
+SAMPLE_SIZE = 2048
+
+# Com METRICS_FILE definido, as métricas são gravadas nesse arquivo a cada
+# METRICS_EXPORT_INTERVAL segundos (.json em JSON, qualquer outro em texto Prometheus)
+METRICS_FILE = os.getenv("METRICS_FILE")
+METRICS_EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL", "15"))
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_exporter = None
+
+
+def _quantile(values, q):
+    if not values:
+        return None
+    position = (len(values) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def inc(name, amount=1):
+    """Adds amount to the counter name."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+    _ensure_exporter()
+
+
+def observe(name, seconds, ok=True):
+    """Records one duration of the operation name (and an error if not ok)."""
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = {
+                "count": 0, "errors": 0, "sum": 0.0, "max": 0.0,
+                "buckets": [0] * len(BUCKETS), "samples": deque(maxlen=SAMPLE_SIZE),
+            }
+        hist["count"] += 1
+        hist["errors"] += 0 if ok else 1
+        hist["sum"] += seconds
+        hist["max"] = max(hist["max"], seconds)
+        position = bisect.bisect_left(BUCKETS, seconds)
+        if position < len(BUCKETS):
+            hist["buckets"][position] += 1
+        hist["samples"].append(seconds)
+    _ensure_exporter()
+
+
+@contextmanager
+def span(name):
+    """Times the block as one run of the operation name; an exception counts as an error."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        observe(name, time.perf_counter() - start, ok=False)
+        raise
+    observe(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator version of span."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summary():
+    """[{operacao, chamadas, erros, p50_ms, p95_ms, p99_ms, media_ms, max_ms}] ordered by total time."""
+    with _lock:
+        snapshot = [(name, dict(hist, samples=sorted(hist["samples"]))) for name, hist in _histograms.items()]
+    rows = []
+    for name, hist in sorted(snapshot, key=lambda item: item[1]["sum"], reverse=True):
+        rows.append({
+            "operacao": name,
+            "chamadas": hist["count"],
+            "erros": hist["errors"],
+            "p50_ms": 1000 * _quantile(hist["samples"], 0.5),
+            "p95_ms": 1000 * _quantile(hist["samples"], 0.95),
+            "p99_ms": 1000 * _quantile(hist["samples"], 0.99),
+            "media_ms": 1000 * hist["sum"] / hist["count"],
+            "max_ms": 1000 * hist["max"],
+        })
+    return rows
+
+
+def counters():
+    with _lock:
+        return dict(_counters)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {name: dict(hist, buckets=list(hist["buckets"])) for name, hist in _histograms.items()}
+        counter_values = dict(_counters)
+    lines = [
+        "# HELP imoveis_operacao_segundos Duração das operações instrumentadas.",
+        "# TYPE imoveis_operacao_segundos histogram",
+    ]
+    for name, hist in sorted(histograms.items()):
+        label = f'operacao="{_escape(name)}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS, hist["buckets"]):
+            cumulative += count
+            lines.append(f'imoveis_operacao_segundos_bucket{{{label},le="{bound}"}} {cumulative}')
+        lines.append(f'imoveis_operacao_segundos_bucket{{{label},le="+Inf"}} {hist["count"]}')
+        lines.append(f"imoveis_operacao_segundos_sum{{{label}}} {hist['sum']:.6f}")
+        lines.append(f"imoveis_operacao_segundos_count{{{label}}} {hist['count']}")
+    lines += [
+        "# HELP imoveis_operacao_erros_total Operações instrumentadas que terminaram com erro.",
+        "# TYPE imoveis_operacao_erros_total counter",
+    ]
+    for name, hist in sorted(histograms.items()):
+        lines.append(f'imoveis_operacao_erros_total{{operacao="{_escape(name)}"}} {hist["errors"]}')
+    lines += [
+        "# HELP imoveis_eventos_total Contadores de eventos.",
+        "# TYPE imoveis_eventos_total counter",
+    ]
+    for name, value in sorted(counter_values.items()):
+        lines.append(f'imoveis_eventos_total{{evento="{_escape(name)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def export(path=None):
+    """Writes the metrics to path (JSON if it ends in .json, else Prometheus text), atomically."""
+    path = path or METRICS_FILE
+    if path.endswith(".json"):
+        content = json.dumps({"operacoes": summary(), "contadores": counters()}, indent=2, ensure_ascii=False)
+    else:
+        content = prometheus_text()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _export_loop():
+    while True:
+        time.sleep(METRICS_EXPORT_INTERVAL)
+        try:
+            export()
+        except OSError:
+            pass
+
+
+def _ensure_exporter():
+    global _exporter
+    if METRICS_FILE and _exporter is None:
+        with _lock:
+            if _exporter is None:
+                _exporter = threading.Thread(target=_export_loop, name="metrics-export", daemon=True)
+                _exporter.start()
@@ -0,0 +1,232 @@
+"""
+Local stand-ins for Nominatim and the Groq API, plus synthetic listing pages.
+
+One HTTP server answers:
+    GET  /search?q=...                    Nominatim-style geocoding (deterministic coordinates)
+    POST /openai/v1/chat/completions      Groq/OpenAI-style chat completion with the extracted JSON
+    GET  /anuncio/<n>                     a synthetic listing page (synthetic.listing_html)
+
+Latency, server errors and 429 responses can be injected per service (nominatim, groq,
+paginas), so retries, backoff and concurrency limits can be exercised repeatably.
+Point the app at it with NOMINATIM_URL=<base>/search and GROQ_BASE_URL=<base>:
+
+    python mock_servers.py --port 8765
+    python mock_servers.py --latency 0.2 --jitter 0.1 --error-rate 0.05 --max-rps 1 --services nominatim
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from synthetic import LAT_RANGE, LON_RANGE, listing_html
+
+# Endereços com esta palavra não são encontrados pelo Nominatim simulado
+NOT_FOUND_MARKER = "inexistente"
+
+SERVICES = ["nominatim", "groq", "paginas"]
+
+
+class Faults:
+    """
+    Misbehaviour injected into one service's responses.
+
+    latency/jitter: fixed delay plus a uniform random extra (seconds).
+    error_rate: fraction of requests answered with 503.
+    throttle_rate: fraction of requests answered with 429 (with Retry-After).
+    max_rps: requests per second accepted before answering 429, like a real rate limit.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, max_rps=None, retry_after=1.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.max_rps = max_rps
+        self.retry_after = retry_after
+        self._window = int(time.monotonic())
+        self._window_count = 0
+
+    def over_limit(self):
+        """Counts one request against max_rps; True if it goes over (caller holds the lock)."""
+        if not self.max_rps:
+            return False
+        now = int(time.monotonic())
+        if now != self._window:
+            self._window, self._window_count = now, 0
+        self._window_count += 1
+        return self._window_count > self.max_rps
+
+
+def fake_coordinates(address):
+    """Deterministic coordinates inside Curitiba for an address."""
+    digest = hashlib.sha256(address.strip().lower().encode("utf-8")).digest()
+    lat = LAT_RANGE[0] + (LAT_RANGE[1] - LAT_RANGE[0]) * int.from_bytes(digest[:4], "big") / 2 ** 32
+    lon = LON_RANGE[0] + (LON_RANGE[1] - LON_RANGE[0]) * int.from_bytes(digest[4:8], "big") / 2 ** 32
+    return round(lat, 7), round(lon, 7)
+
+
+def _number(pattern, text, default=None):
+    match = re.search(pattern, text, re.IGNORECASE)
+    if not match:
+        return default
+    return float(match.group(1).replace(".", "").replace(",", "."))
+
+
+def fake_extraction(prompt):
+    """The JSON an LLM would return for a synthetic listing page, read off the prompt text."""
+    text = prompt.split("Text Content:", 1)[-1]
+    address = re.search(r"Endereço:\s*(.+)", text)
+    return {
+        "Endereço": address.group(1).strip() if address else "",
+        "Tamanho (m²)": _number(r"([\d.,]+)\s*m²", text),
+        "Quartos": int(_number(r"(\d+)\s*quartos?", text, 0)),
+        "Banheiros": int(_number(r"(\d+)\s*banheiro", text, 0)),
+        "Preço do Aluguel (R$)": _number(r"R\$\s*([\d.,]+)", text),
+        "Observações": "",
+        "Qualidade": 3,
+        "Data da Visita": None,
+    }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle adds ~40 ms per response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        payload = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _inject(self, service):
+        """Applies the service's faults; returns True if an error response was already sent."""
+        server = self.server
+        faults = server.faults.get(service) or Faults()
+        with server.lock:
+            roll = server.random.random()
+            delay = faults.latency + (server.random.uniform(0, faults.jitter) if faults.jitter else 0.0)
+            over_limit = faults.over_limit()
+        if delay:
+            time.sleep(delay)
+        if over_limit or roll < faults.throttle_rate:
+            status = 429
+            self.send_response(429)
+            self.send_header("Retry-After", f"{faults.retry_after:g}")
+            self.send_header("Content-Type", "application/json")
+            body = b'{"error": "rate limited"}'
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif roll < faults.throttle_rate + faults.error_rate:
+            status = 503
+            self._send(503, json.dumps({"error": "injected failure"}))
+        else:
+            status = None
+        with server.lock:
+            server.stats[(service, status or 200)] += 1
+        return status is not None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        service = "nominatim" if url.path == "/search" else "paginas"
+        if self._inject(service):
+            return
+        if url.path == "/search":
+            address = parse_qs(url.query).get("q", [""])[0]
+            if not address or NOT_FOUND_MARKER in address.lower():
+                return self._send(200, "[]")
+            lat, lon = fake_coordinates(address)
+            return self._send(200, json.dumps([{"lat": str(lat), "lon": str(lon), "display_name": address}]))
+        match = re.fullmatch(r"/anuncio/(\d+)", url.path)
+        if match:
+            return self._send(200, listing_html(int(match.group(1))), "text/html; charset=utf-8")
+        self._send(404, json.dumps({"error": "not found"}))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self._inject("groq"):
+            return
+        if urlparse(self.path).path != "/openai/v1/chat/completions":
+            return self._send(404, json.dumps({"error": "not found"}))
+        prompt = " ".join(m.get("content", "") for m in body.get("messages", []))
+        prompt_tokens = len(prompt) // 4
+        self._send(200, json.dumps({
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": json.dumps(fake_extraction(prompt), ensure_ascii=False)},
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 80, "total_tokens": prompt_tokens + 80},
+        }, ensure_ascii=False))
+
+
+def start_mock_server(host="127.0.0.1", port=0, faults=None, seed=0):
+    """
+    Starts the mock server in a daemon thread and returns (server, base_url).
+    faults maps service name to Faults; server.stats counts responses per (service, status).
+    """
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.faults = dict(faults or {})
+    server.random = random.Random(seed)
+    server.lock = threading.Lock()
+    server.stats = Counter()
+    threading.Thread(target=server.serve_forever, name="mock-servers", daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def add_fault_arguments(parser):
+    """Command-line options for fault injection, shared with load_test.py."""
+    group = parser.add_argument_group("falhas simuladas")
+    group.add_argument("--latency", type=float, default=0.0, help="Atraso fixo por resposta (s)")
+    group.add_argument("--jitter", type=float, default=0.0, help="Atraso extra aleatório de até N s")
+    group.add_argument("--error-rate", type=float, default=0.0, help="Fração de respostas 503")
+    group.add_argument("--throttle-rate", type=float, default=0.0, help="Fração de respostas 429")
+    group.add_argument("--max-rps", type=float, help="Requisições/s aceitas antes de responder 429")
+    group.add_argument("--retry-after", type=float, default=1.0, help="Retry-After das respostas 429 (s)")
+    group.add_argument("--services", nargs="+", choices=SERVICES, default=SERVICES,
+                       help="Serviços afetados pelas falhas")
+    group.add_argument("--seed", type=int, default=0, help="Semente das falhas aleatórias")
+
+
+def faults_from_args(args):
+    # One instance per service, so each has its own max_rps window
+    return {
+        service: Faults(args.latency, args.jitter, args.error_rate, args.throttle_rate, args.max_rps, args.retry_after)
+        for service in args.services
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidores simulados de Nominatim e Groq")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(args.host, args.port, faults_from_args(args), args.seed)
+    print(f"Servidores simulados em {base_url}")
+    print(f"  NOMINATIM_URL={base_url}/search")
+    print(f"  GROQ_BASE_URL={base_url}")
+    print(f"  Anúncios: {base_url}/anuncio/1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
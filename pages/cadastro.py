@@ -1,11 +1,13 @@
 import streamlit as st
 from datetime import date
-from utils import geocode_address
-from data import load_data, save_data
-from scraper import get_page_content, extract_property_data
+from utils import get_cached_geocode
+from data import get_property, insert_property
+from dedup import REASONS, duplicate_index
+from scraper import extraction_cache_stats, text_reduction_stats
+from jobs import (DONE, FAILED, PENDING, RUNNING, active_count, failed_geocodes, get_job, recent_jobs,
+                  retry_failed_geocodes, submit_extraction, submit_geocode)
 import os
 from dotenv import load_dotenv
-import pandas as pd
 
 # Load environment variables
 load_dotenv()
@@ -41,41 +43,91 @@ if "url_imovel" not in st.session_state:
 groq_api_key = os.getenv("GROQ_API_KEY")
 
 if not groq_api_key:
-    st.warning("GROQ_API_KEY environment variable not set. Auto-fill feature will be disabled.")
+    st.warning("GROQ_API_KEY environment variable not set. Auto-fill will only work for pages with structured data (OLX, ZAP, VivaReal, QuintoAndar...).")
 
 url_input = st.text_input("URL da Página do Imóvel (Opcional)", help="Cole o link de uma página de imóvel para preencher automaticamente.")
-auto_fill_button = st.button("Preencher Automaticamente", disabled=not groq_api_key)
+auto_fill_button = st.button("Preencher Automaticamente")
+
+cache_stats = extraction_cache_stats()
+if cache_stats["hits"] + cache_stats["misses"]:
+    st.caption(
+        f"Cache de extração: {cache_stats['hit_rate']:.0%} de acertos "
+        f"({cache_stats['hits']} de {cache_stats['hits'] + cache_stats['misses']}), "
+        f"{cache_stats['tokens_saved']:,} tokens economizados"
+    )
+reduction_stats = text_reduction_stats()
+if reduction_stats["pages"]:
+    st.caption(
+        f"Texto enviado ao LLM: {reduction_stats['tokens_after']:,} de {reduction_stats['tokens_before']:,} "
+        f"tokens estimados ({reduction_stats['reduction']:.0%} de redução)"
+    )
+
+
+def fill_form(extracted_data):
+    st.session_state.endereco = extracted_data.get("Endereço", "")
+    st.session_state.tamanho = extracted_data.get("Tamanho (m²)", 1.0)
+    st.session_state.quartos = extracted_data.get("Quartos", 0)
+    st.session_state.banheiros = extracted_data.get("Banheiros", 0)
+    st.session_state.preco_aluguel = extracted_data.get("Preço do Aluguel (R$)", 0.0)
+    st.session_state.observacoes = extracted_data.get("Observações", "")
+    st.session_state.qualidade = extracted_data.get("Qualidade", 3)
+
+    # Handle date conversion
+    date_str = extracted_data.get("Data da Visita")
+    if date_str:
+        try:
+            st.session_state.data_visita = date.fromisoformat(date_str)
+        except ValueError:
+            st.session_state.data_visita = date.today()
+    else:
+        st.session_state.data_visita = date.today()
+
+
+@st.fragment(run_every=1)
+def extraction_progress(job_id):
+    # Só este trecho é reexecutado enquanto a extração roda; ao terminar, a página inteira atualiza
+    if get_job(job_id)["estado"] in (DONE, FAILED):
+        st.rerun()
+    st.info("⏳ Extraindo dados da página em segundo plano... O formulário será preenchido quando terminar.")
+
 
 if auto_fill_button and url_input:
-    with st.spinner("Extraindo dados da página..."):
-        text_content = get_page_content(url_input)
-        if text_content:
-            extracted_data = extract_property_data(text_content, groq_api_key)
-            if extracted_data:
-                st.session_state.endereco = extracted_data.get("Endereço", "")
-                st.session_state.tamanho = extracted_data.get("Tamanho (m²)", 1.0)
-                st.session_state.quartos = extracted_data.get("Quartos", 0)
-                st.session_state.banheiros = extracted_data.get("Banheiros", 0)
-                st.session_state.preco_aluguel = extracted_data.get("Preço do Aluguel (R$)", 0.0)
-                st.session_state.observacoes = extracted_data.get("Observações", "")
-                st.session_state.qualidade = extracted_data.get("Qualidade", 3)
-                st.session_state.url_imovel = url_input  # Save the URL
-                
-                # Handle date conversion
-                date_str = extracted_data.get("Data da Visita")
-                if date_str:
-                    try:
-                        st.session_state.data_visita = date.fromisoformat(date_str)
-                    except ValueError:
-                        st.session_state.data_visita = date.today()
-                else:
-                    st.session_state.data_visita = date.today()
+    # A extração roda numa tarefa em segundo plano; a página não fica bloqueada esperando
+    st.session_state.job_extracao = submit_extraction(url_input)
+    st.session_state.url_imovel = url_input  # Save the URL
+
+extraction_job_id = st.session_state.get("job_extracao")
+if extraction_job_id is not None:
+    extraction_job = get_job(extraction_job_id)
+    if extraction_job["estado"] == DONE:
+        fill_form(extraction_job["resultado"])
+        del st.session_state.job_extracao
+        st.success("Dados extraídos e formulário preenchido! Revise as informações antes de cadastrar.")
+    elif extraction_job["estado"] == FAILED:
+        del st.session_state.job_extracao
+        st.error(f"{extraction_job['erro']}. Verifique a URL ou tente preencher manualmente.")
+    else:
+        extraction_progress(extraction_job_id)
+
+
+def save_property(new_imovel):
+    new_id = insert_property(new_imovel)
+    if new_imovel["Latitude"] is None:
+        submit_geocode(new_imovel["Endereço"], new_id)
+        st.success("Imóvel cadastrado com sucesso! As coordenadas estão sendo obtidas em segundo plano.")
+    else:
+        st.success("Imóvel cadastrado com sucesso!")
+    # Clear form fields after successful submission
+    st.session_state.endereco = ""
+    st.session_state.tamanho = 1.0
+    st.session_state.quartos = 0
+    st.session_state.banheiros = 0
+    st.session_state.preco_aluguel = 0.0
+    st.session_state.observacoes = ""
+    st.session_state.qualidade = 3
+    st.session_state.data_visita = date.today()
+    st.session_state.url_imovel = ""
 
-                st.success("Dados extraídos e formulário preenchido! Revise as informações antes de cadastrar.")
-            else:
-                st.error("Não foi possível extrair os dados da página. Verifique a URL ou tente preencher manualmente.")
-        else:
-            st.error("Não foi possível carregar o conteúdo da página. Verifique a URL ou sua conexão.")
 
 with st.form("cadastro_imovel_form"):
     endereco = st.text_input("Endereço Completo", value=st.session_state.endereco, help="Ex: Rua da Paz, 123, Centro, São Paulo - SP", key="form_endereco")
@@ -103,9 +155,13 @@ with st.form("cadastro_imovel_form"):
         st.session_state.data_visita = data_visita
 
         if st.session_state.endereco:
-            lat, lon = geocode_address(st.session_state.endereco)
-            if lat is not None and lon is not None:
-                df = load_data()
+            # Endereço já geocodificado antes: coordenadas na hora. Senão o imóvel é salvo
+            # com coordenadas pendentes e uma tarefa em segundo plano as preenche.
+            cached = get_cached_geocode(st.session_state.endereco)
+            if cached is not None and cached[0] is None:
+                st.error("Não foi possível geocodificar o endereço. Por favor, tente novamente com um endereço mais específico.")
+            else:
+                lat, lon = cached if cached is not None else (None, None)
                 new_imovel = {
                     "Endereço": st.session_state.endereco,
                     "Tamanho (m²)": st.session_state.tamanho,
@@ -119,22 +175,80 @@ with st.form("cadastro_imovel_form"):
                     "Longitude": lon,
                     "URL": st.session_state.url_imovel
                 }
-                # Use pandas.concat instead of deprecated _append
-                new_df = pd.DataFrame([new_imovel])
-                df = pd.concat([df, new_df], ignore_index=True)
-                save_data(df)
-                st.success("Imóvel cadastrado com sucesso!")
-                # Clear form fields after successful submission
-                st.session_state.endereco = ""
-                st.session_state.tamanho = 1.0
-                st.session_state.quartos = 0
-                st.session_state.banheiros = 0
-                st.session_state.preco_aluguel = 0.0
-                st.session_state.observacoes = ""
-                st.session_state.qualidade = 3
-                st.session_state.data_visita = date.today()
-                st.session_state.url_imovel = ""
-            else:
-                st.error("Não foi possível geocodificar o endereço. Por favor, tente novamente com um endereço mais específico.")
+                duplicates = duplicate_index().candidates(new_imovel)
+                if duplicates:
+                    # Fica pendente até o usuário confirmar ou descartar (abaixo do formulário)
+                    st.session_state.cadastro_pendente = {"imovel": new_imovel, "duplicados": duplicates}
+                else:
+                    save_property(new_imovel)
         else:
             st.error("Por favor, preencha o campo Endereço Completo.")
+
+pending = st.session_state.get("cadastro_pendente")
+if pending:
+    confirmation = st.empty()
+    with confirmation.container():
+        st.warning("Este imóvel parece já estar cadastrado (o mesmo anúncio em outro site, por exemplo):")
+        for candidate in pending["duplicados"]:
+            existing = get_property(candidate["id"])
+            if existing is None:
+                continue
+            details = [f"{existing['Tamanho (m²)']:.0f} m²" if existing["Tamanho (m²)"] else None,
+                       f"R$ {existing['Preço do Aluguel (R$)']:.2f}" if existing["Preço do Aluguel (R$)"] else None]
+            reasons = ", ".join(REASONS[r] for r in candidate["motivos"])
+            st.markdown(f"- **{existing['Endereço']}** (id {existing['id']}) — "
+                        f"{', '.join(d for d in details if d) or 'sem tamanho/preço'} — _{reasons}_")
+        col_save, col_cancel = st.columns(2)
+        with col_save:
+            save_anyway = st.button("Cadastrar mesmo assim")
+        with col_cancel:
+            discard = st.button("Não cadastrar")
+    if save_anyway or discard:
+        del st.session_state.cadastro_pendente
+        confirmation.empty()
+        if save_anyway:
+            save_property(pending["imovel"])
+
+
+JOB_STATES = {PENDING: "⏳ Na fila", RUNNING: "⚙️ Executando", DONE: "✅ Concluída", FAILED: "❌ Erro"}
+JOB_KINDS = {"geocode": "Geocodificação", "extracao": "Extração de anúncio"}
+
+
+def jobs_panel(polling):
+    jobs = recent_jobs(10)
+    if polling and active_count() == 0:
+        # Tudo terminou: uma execução completa para a página parar de consultar
+        st.rerun()
+    st.dataframe(
+        [{
+            "Tarefa": job["id"],
+            "Tipo": JOB_KINDS.get(job["tipo"], job["tipo"]),
+            "Estado": JOB_STATES.get(job["estado"], job["estado"]),
+            "Imóvel": job["imovel_id"],
+            "Detalhe": job["erro"] or job["parametros"].get("endereco") or job["parametros"].get("url", ""),
+        } for job in jobs],
+        hide_index=True,
+    )
+
+
+failed = failed_geocodes()
+if failed:
+    st.subheader("Imóveis sem Coordenadas")
+    if st.button("Tentar geocodificar novamente"):
+        queued = retry_failed_geocodes()
+        st.info(f"{len(queued)} geocodificação(ões) de volta na fila." if queued else
+                "Nenhuma geocodificação para repetir: os endereços abaixo não foram encontrados.")
+        failed = failed_geocodes()
+if failed:
+    st.warning(f"A geocodificação falhou para {len(failed)} imóvel(is); eles não aparecem no mapa até terem coordenadas. "
+               "Endereços não encontrados precisam ser corrigidos na lista de imóveis; falhas de conexão "
+               "podem ser repetidas (e são repetidas automaticamente quando o app reinicia).")
+    st.dataframe(
+        [{"Imóvel": job["imovel_id"], "Endereço": job["parametros"].get("endereco", ""), "Erro": job["erro"]} for job in failed],
+        hide_index=True,
+    )
+
+if recent_jobs(1):
+    st.subheader("Tarefas em Segundo Plano")
+    polling = active_count() > 0
+    st.fragment(jobs_panel, run_every=2 if polling else None)(polling)
@@ -0,0 +1,64 @@
+import streamlit as st
+import pandas as pd
+import metrics
+from http_client import endpoint_stats
+
+st.set_page_config(
+    page_title="Desempenho",
+    page_icon="⏱️",
+    layout="wide",
+)
+
+st.title("Desempenho da Aplicação")
+st.write("Tempos medidos neste processo do servidor desde que ele foi iniciado (ou desde a última limpeza).")
+
+operations = metrics.summary()
+if not operations:
+    st.info("Nenhuma operação medida ainda. Use as outras páginas e volte aqui.")
+else:
+    st.subheader("Latência por Operação")
+    table = pd.DataFrame(operations).rename(columns={
+        "operacao": "Operação", "chamadas": "Chamadas", "erros": "Erros",
+        "p50_ms": "p50 (ms)", "p95_ms": "p95 (ms)", "p99_ms": "p99 (ms)", "media_ms": "Média (ms)", "max_ms": "Máx. (ms)",
+    })
+    st.dataframe(
+        table,
+        hide_index=True,
+        column_config={col: st.column_config.NumberColumn(format="%.1f")
+                       for col in ["p50 (ms)", "p95 (ms)", "p99 (ms)", "Média (ms)", "Máx. (ms)"]},
+    )
+    st.bar_chart(table.set_index("Operação")[["p50 (ms)", "p95 (ms)"]], stack=False, horizontal=True)
+
+endpoints = endpoint_stats()
+if endpoints:
+    st.subheader("Serviços Externos (HTTP)")
+    st.dataframe(
+        pd.DataFrame([
+            {"Serviço": name, "Requisições": s["requests"], "Erros": s["errors"], "Novas tentativas": s["retries"],
+             "Média (ms)": round(s["mean_ms"], 1), "Máx. (ms)": round(s["max_ms"], 1)}
+            for name, s in endpoints.items()
+        ]),
+        hide_index=True,
+    )
+
+event_counts = metrics.counters()
+if event_counts:
+    st.subheader("Falhas Registradas")
+    st.dataframe(pd.DataFrame(sorted(event_counts.items()), columns=["Evento", "Total"]), hide_index=True)
+
+st.markdown("---")
+col1, col2 = st.columns(2)
+with col1:
+    st.download_button(
+        "Baixar métricas (Prometheus)",
+        metrics.prometheus_text(),
+        file_name="imoveis_metricas.prom",
+        mime="text/plain",
+    )
+with col2:
+    if st.button("Limpar métricas"):
+        metrics.reset()
+        st.rerun()
+
+if metrics.METRICS_FILE:
+    st.caption(f"As métricas também são gravadas em `{metrics.METRICS_FILE}` a cada {metrics.METRICS_EXPORT_INTERVAL:.0f} s.")
@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from data import load_data
+from data import query_properties
+from stats import stats_index
+
+URL_PAGE_SIZE = 20
 
 st.set_page_config(
     page_title="Estatísticas de Imóveis",
@@ -11,83 +13,119 @@ st.set_page_config(
 
 st.title("Estatísticas e Análises de Imóveis")
 
-df = load_data()
+# Estatísticas mantidas incrementalmente a cada escrita; nada aqui percorre a tabela
+stats = stats_index()
+summary = stats.summary()
 
-if df.empty:
+if summary["total"] == 0:
     st.info("Nenhum imóvel cadastrado ainda para gerar estatísticas.")
 else:
     st.subheader("Estatísticas Básicas")
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Total de Imóveis", len(df))
+        st.metric("Total de Imóveis", summary["total"])
     with col2:
-        st.metric("Preço Médio do Aluguel (R$)", f"{df['Preço do Aluguel (R$)'].mean():,.2f}")
+        st.metric("Preço Médio do Aluguel (R$)", f"{summary['preco_medio'] or 0:,.2f}")
     with col3:
-        st.metric("Tamanho Médio (m²)", f"{df['Tamanho (m²)'].mean():,.2f}")
+        st.metric("Tamanho Médio (m²)", f"{summary['tamanho_medio'] or 0:,.2f}")
+
+    # plotly é importado depois das métricas: elas já aparecem enquanto os gráficos carregam
+    import plotly.express as px
+    import plotly.graph_objects as go
 
     st.subheader("Distribuição de Preços por Qualidade")
-    fig_price_quality = px.box(
-        df,
-        x="Qualidade",
-        y="Preço do Aluguel (R$)",
+    fig_price_quality = go.Figure()
+    for box in stats.price_box_by_quality():
+        fig_price_quality.add_trace(go.Box(
+            x=[box["Qualidade"]],
+            q1=[box["q1"]],
+            median=[box["median"]],
+            q3=[box["q3"]],
+            lowerfence=[box["lowerfence"]],
+            upperfence=[box["upperfence"]],
+            name=str(box["Qualidade"]),
+            marker_color="#636efa",
+            showlegend=False,
+        ))
+        if box["outliers"]:
+            fig_price_quality.add_trace(go.Scatter(
+                x=[box["Qualidade"]] * len(box["outliers"]),
+                y=box["outliers"],
+                mode="markers",
+                marker_color="#636efa",
+                showlegend=False,
+            ))
+    fig_price_quality.update_layout(
         title="Distribuição de Preços por Qualidade",
-        labels={
-            "Qualidade": "Qualidade (estrelas)",
-            "Preço do Aluguel (R$)": "Preço do Aluguel (R$)"
-        }
+        xaxis_title="Qualidade (estrelas)",
+        yaxis_title="Preço do Aluguel (R$)",
     )
     st.plotly_chart(fig_price_quality, use_container_width=True)
 
     st.subheader("Contagem de Imóveis por Número de Quartos")
-    fig_quartos = px.histogram(
-        df,
-        x="Quartos",
+    rooms = pd.DataFrame(stats.rooms_histogram(), columns=["Quartos", "Contagem"])
+    fig_quartos = px.bar(
+        rooms,
+        x=rooms["Quartos"].astype(str),
+        y="Contagem",
         title="Contagem de Imóveis por Número de Quartos",
         labels={
-            "Quartos": "Número de Quartos",
-            "count": "Contagem"
+            "x": "Número de Quartos",
+            "Contagem": "Contagem"
         },
-        category_orders={"Quartos": sorted(df["Quartos"].unique())}
     )
     st.plotly_chart(fig_quartos, use_container_width=True)
 
     st.subheader("Ranking dos Imóveis Mais Bem Avaliados")
-    df_sorted_quality = df.sort_values(by="Qualidade", ascending=False)
-    st.dataframe(df_sorted_quality[["Endereço", "Qualidade", "Preço do Aluguel (R$)", "Tamanho (m²)"]].head(10))
+    top = stats.top(10)
+    st.dataframe(pd.DataFrame(
+        [row for _, row in top],
+        index=pd.Index([property_id for property_id, _ in top], name="id"),
+        columns=["Endereço", "Qualidade", "Preço do Aluguel (R$)", "Tamanho (m²)"],
+    ))
 
     # Estatísticas sobre URLs
-    if "URL" in df.columns:
-        st.subheader("📊 Estatísticas sobre URLs")
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Contagem de imóveis com URL
-            imoveis_com_url = df["URL"].notna() & (df["URL"] != "")
-            st.metric("Imóveis com URL", f"{imoveis_com_url.sum()}")
-            st.metric("Imóveis sem URL", f"{len(df) - imoveis_com_url.sum()}")
-        
-        with col2:
-            # Porcentagem de imóveis com URL
-            percentual_com_url = (imoveis_com_url.sum() / len(df)) * 100
-            st.metric("Percentual com URL", f"{percentual_com_url:.1f}%")
-            
-            # Imóveis com URL por qualidade
-            if imoveis_com_url.sum() > 0:
-                df_com_url = df[imoveis_com_url]
-                qualidade_media_url = df_com_url["Qualidade"].mean()
-                st.metric("Qualidade Média (com URL)", f"{qualidade_media_url:.1f} ⭐")
-        
-        # Lista de imóveis com URL
-        if imoveis_com_url.sum() > 0:
-            st.subheader("🔗 Imóveis com URL Cadastrada")
-            df_com_url = df[imoveis_com_url]
-            for idx, row in df_com_url.iterrows():
-                with st.expander(f"📍 {row['Endereço']} - R$ {row['Preço do Aluguel (R$)']:,.0f}"):
-                    st.write(f"**URL:** [{row['URL']}]({row['URL']})")
-                    st.write(f"**Qualidade:** {row['Qualidade']} ⭐")
-                    st.write(f"**Tamanho:** {row['Tamanho (m²)']} m²")
-                    st.write(f"**Quartos:** {row['Quartos']} | **Banheiros:** {row['Banheiros']}")
-                    if row['Observações']:
-                        st.write(f"**Observações:** {row['Observações']}")
+    st.subheader("📊 Estatísticas sobre URLs")
+    col1, col2 = st.columns(2)
+
+    with col1:
+        # Contagem de imóveis com URL
+        st.metric("Imóveis com URL", f"{summary['com_url']}")
+        st.metric("Imóveis sem URL", f"{summary['total'] - summary['com_url']}")
+
+    with col2:
+        # Porcentagem de imóveis com URL
+        percentual_com_url = (summary["com_url"] / summary["total"]) * 100
+        st.metric("Percentual com URL", f"{percentual_com_url:.1f}%")
+
+        # Imóveis com URL por qualidade
+        if summary["com_url"] > 0:
+            st.metric("Qualidade Média (com URL)", f"{summary['qualidade_media_url']:.1f} ⭐")
 
+    # Lista de imóveis com URL: paginada e só renderizada quando solicitada
+    if summary["com_url"] > 0:
+        st.subheader("🔗 Imóveis com URL Cadastrada")
+        if st.toggle(f"Mostrar os {summary['com_url']} imóveis com URL"):
+            col_search, col_page = st.columns([4, 1])
+            with col_search:
+                url_search = st.text_input("🔎 Buscar", placeholder="Endereço, observações ou URL", key="url_search")
+            with col_page:
+                url_page = st.number_input("Página", min_value=1, value=1, step=1, key="url_page")
 
+            df_com_url, total_url = query_properties(
+                url_search, "Qualidade", ascending=False,
+                limit=URL_PAGE_SIZE, offset=(url_page - 1) * URL_PAGE_SIZE, only_with_url=True,
+            )
+            if df_com_url.empty:
+                st.info("Nenhum imóvel com URL encontrado para a busca." if url_search else "Página vazia.")
+            else:
+                st.caption(f"{total_url} imóvel(is) — página {url_page} de {max(1, -(-total_url // URL_PAGE_SIZE))}")
+                st.dataframe(
+                    df_com_url[["Endereço", "Preço do Aluguel (R$)", "Qualidade", "Tamanho (m²)",
+                                "Quartos", "Banheiros", "URL", "Observações"]],
+                    column_config={
+                        "URL": st.column_config.LinkColumn("URL", display_text="Ver anúncio"),
+                        "Preço do Aluguel (R$)": st.column_config.NumberColumn(format="R$ %.0f"),
+                        "Qualidade": st.column_config.NumberColumn(format="%d ⭐"),
+                    },
+                )
@@ -1,8 +1,15 @@
+import tempfile
+
 import streamlit as st
 import pandas as pd
-from data import load_data, save_data
+from bulk_io import FORMATS, detect_format, export_file, import_file
+from dedup import REASONS, duplicate_index
+from data import SORTABLE_COLUMNS, ConflictError, get_property, query_properties, update_property, delete_property
 from utils import geocode_address
 
+PAGE_SIZES = [25, 50, 100, 200]
+SORT_LABELS = {"id": "Ordem de cadastro", "relevancia": "Relevância"}
+
 st.set_page_config(
     page_title="Listar Imóveis",
     page_icon="📋",
@@ -11,22 +18,59 @@ st.set_page_config(
 
 st.title("Lista de Imóveis Cadastrados")
 
-df = load_data()
+# Busca, ordenação e paginação feitas no banco: só a página atual é carregada
+col_search, col_sort, col_order, col_size, col_page = st.columns([4, 2, 2, 1, 1])
+with col_search:
+    search = st.text_input("🔎 Buscar", placeholder="Endereço, observações ou URL",
+                           help="Palavras inteiras ou começos de palavras, sem diferenciar acentos (ex.: varanda metrô)")
+with col_sort:
+    # Com uma busca, o padrão é mostrar primeiro os mais relevantes
+    sort_by = st.selectbox("Ordenar por", (["relevancia"] if search else []) + ["id"] + SORTABLE_COLUMNS,
+                           format_func=lambda col: SORT_LABELS.get(col, col))
+with col_order:
+    ascending = st.radio("Ordem", ["Crescente", "Decrescente"], horizontal=True) == "Crescente"
+with col_size:
+    page_size = st.selectbox("Por página", PAGE_SIZES, index=1)
+with col_page:
+    page_number = st.number_input("Página", min_value=1, value=1, step=1)
 
-if df.empty:
-    st.info("Nenhum imóvel cadastrado ainda.")
+if sort_by == "relevancia":
+    ascending = True  # mais relevantes primeiro
+df, total = query_properties(search, sort_by, ascending, limit=page_size, offset=(page_number - 1) * page_size)
+total_pages = max(1, -(-total // page_size))
+if df.empty and total > 0:
+    # Página além do fim (ex.: após uma busca): mostrar a última
+    page_number = total_pages
+    df, total = query_properties(search, sort_by, ascending, limit=page_size, offset=(page_number - 1) * page_size)
+
+if total == 0:
+    st.info("Nenhum imóvel encontrado para a busca." if search else "Nenhum imóvel cadastrado ainda.")
 else:
+    st.caption(f"{total} imóvel(is) — página {page_number} de {total_pages}")
     st.dataframe(df)
 
     st.subheader("Editar ou Excluir Imóvel")
 
-    # Selecionar imóvel para edição/exclusão
-    options = [f"{i+1} - {row['Endereço']}" for i, row in df.iterrows()]
-    selected_option = st.selectbox("Selecione o imóvel para editar ou excluir:", options)
+    # Selecionar imóvel para edição/exclusão (entre os da página atual)
+    selected_id = st.selectbox(
+        "Selecione o imóvel para editar ou excluir:",
+        df.index.tolist(),
+        format_func=lambda i: f"{i} - {df.at[i, 'Endereço']}",
+    )
+
+    # Sempre relido pelo id: a linha pode ter mudado desde que a página foi carregada
+    selected_imovel = get_property(selected_id) if selected_id is not None else None
 
-    if selected_option:
-        selected_index = int(selected_option.split(" ")[0]) - 1
-        selected_imovel = df.iloc[selected_index]
+    if selected_id is not None and selected_imovel is None:
+        st.warning("Este imóvel foi excluído por outra sessão.")
+
+    if selected_imovel is not None:
+        # Versão que o usuário está vendo, guardada na execução anterior. As gravações só
+        # acontecem se o registro ainda estiver nessa versão (controle otimista).
+        version_key = f"versao_imovel_{selected_id}"
+        seen_version = st.session_state.get(version_key, selected_imovel["versao"])
+        conflict_message = ("Este imóvel foi alterado por outra sessão enquanto você editava. "
+                            "Os dados abaixo foram atualizados; revise e tente novamente.")
 
         st.write(f"Você selecionou o imóvel: **{selected_imovel['Endereço']}**")
 
@@ -36,45 +80,128 @@ else:
             st.subheader("Editar Imóvel")
             with st.form("edit_imovel_form"):
                 edit_endereco = st.text_input("Endereço Completo", value=selected_imovel["Endereço"])
-                edit_tamanho = st.number_input("Tamanho (m²)", value=float(selected_imovel["Tamanho (m²)"]), format="%.2f")
-                edit_quartos = st.number_input("Número de Quartos", value=int(selected_imovel["Quartos"]), step=1)
-                edit_banheiros = st.number_input("Número de Banheiros", value=int(selected_imovel["Banheiros"]), step=1)
-                edit_preco_aluguel = st.number_input("Preço do Aluguel (R$)", value=float(selected_imovel["Preço do Aluguel (R$)"]), format="%.2f")
-                edit_observacoes = st.text_area("Observações Gerais", value=selected_imovel["Observações"])
-                edit_qualidade = st.slider("Marcador de Qualidade (1-5 estrelas)", min_value=1, max_value=5, step=1, value=int(selected_imovel["Qualidade"]))
+                edit_tamanho = st.number_input("Tamanho (m²)", value=float(selected_imovel["Tamanho (m²)"] or 1.0), format="%.2f")
+                edit_quartos = st.number_input("Número de Quartos", value=int(selected_imovel["Quartos"] or 0), step=1)
+                edit_banheiros = st.number_input("Número de Banheiros", value=int(selected_imovel["Banheiros"] or 0), step=1)
+                edit_preco_aluguel = st.number_input("Preço do Aluguel (R$)", value=float(selected_imovel["Preço do Aluguel (R$)"] or 0.0), format="%.2f")
+                edit_observacoes = st.text_area("Observações Gerais", value=selected_imovel["Observações"] or "")
+                edit_qualidade = st.slider("Marcador de Qualidade (1-5 estrelas)", min_value=1, max_value=5, step=1, value=int(selected_imovel["Qualidade"] or 3))
                 edit_data_visita = st.date_input("Data da Visita", value=pd.to_datetime(selected_imovel["Data da Visita"]).date())
-                edit_url = st.text_input("URL do Imóvel", value=selected_imovel.get("URL", ""), help="Link da página onde o imóvel foi encontrado")
+                edit_url = st.text_input("URL do Imóvel", value=selected_imovel.get("URL") or "", help="Link da página onde o imóvel foi encontrado")
 
                 edited = st.form_submit_button("Salvar Alterações")
 
                 if edited:
-                    lat, lon = geocode_address(edit_endereco)
+                    # Só geocodifica de novo se o endereço mudou
+                    if (edit_endereco.strip() == str(selected_imovel["Endereço"] or "").strip()
+                            and pd.notna(selected_imovel["Latitude"]) and pd.notna(selected_imovel["Longitude"])):
+                        lat, lon = float(selected_imovel["Latitude"]), float(selected_imovel["Longitude"])
+                    else:
+                        lat, lon = geocode_address(edit_endereco)
                     if lat is not None and lon is not None:
-                        df.loc[selected_index] = {
-                            "Endereço": edit_endereco,
-                            "Tamanho (m²)": edit_tamanho,
-                            "Quartos": edit_quartos,
-                            "Banheiros": edit_banheiros,
-                            "Preço do Aluguel (R$)": edit_preco_aluguel,
-                            "Observações": edit_observacoes,
-                            "Qualidade": edit_qualidade,
-                            "Data da Visita": edit_data_visita.strftime("%Y-%m-%d"),
-                            "Latitude": lat,
-                            "Longitude": lon,
-                            "URL": edit_url
-                        }
-                        save_data(df)
-                        st.success("Imóvel atualizado com sucesso!")
-                        st.rerun()
+                        try:
+                            update_property(selected_id, {
+                                "Endereço": edit_endereco,
+                                "Tamanho (m²)": edit_tamanho,
+                                "Quartos": edit_quartos,
+                                "Banheiros": edit_banheiros,
+                                "Preço do Aluguel (R$)": edit_preco_aluguel,
+                                "Observações": edit_observacoes,
+                                "Qualidade": edit_qualidade,
+                                "Data da Visita": edit_data_visita.strftime("%Y-%m-%d"),
+                                "Latitude": lat,
+                                "Longitude": lon,
+                                "URL": edit_url
+                            }, expected_version=seen_version)
+                        except ConflictError:
+                            st.error(conflict_message)
+                        else:
+                            st.session_state.pop(version_key, None)
+                            st.success("Imóvel atualizado com sucesso!")
+                            st.rerun()
                     else:
                         st.error("Não foi possível geocodificar o endereço. Por favor, tente novamente com um endereço mais específico.")
 
         with col2:
             st.subheader("Excluir Imóvel")
             if st.button("Excluir Imóvel", key="delete_button"):
-                df = df.drop(selected_index).reset_index(drop=True)
-                save_data(df)
-                st.success("Imóvel excluído com sucesso!")
-                st.rerun()
+                try:
+                    delete_property(selected_id, expected_version=seen_version)
+                except ConflictError:
+                    st.error(conflict_message)
+                else:
+                    st.session_state.pop(version_key, None)
+                    st.success("Imóvel excluído com sucesso!")
+                    st.rerun()
+
+        st.session_state[version_key] = selected_imovel["versao"]
 
 
+def export_to_tempfile(fmt):
+    # Gerado só no clique, em partes, num arquivo temporário em vez de juntar as partes em
+    # strings; o download_button só aceita bytes/BytesIO/BufferedReader, então devolve os bytes
+    with tempfile.TemporaryFile("w+b") as target:
+        with open(target.fileno(), "w", encoding="utf-8", newline="", closefd=False) as stream:
+            export_file(stream, fmt)
+        target.seek(0)
+        return target.read()
+
+
+st.markdown("---")
+with st.expander("📦 Importar ou exportar em lote"):
+    col_import, col_export = st.columns(2)
+
+    with col_import:
+        st.subheader("Importar")
+        uploaded = st.file_uploader("Arquivo CSV ou JSONL", type=["csv", "jsonl", "ndjson"])
+        st.caption("Mesmas colunas do cadastro. Possíveis duplicados de imóveis já cadastrados (mesma regra do cadastro) são ignorados; "
+                   "imóveis sem coordenadas podem ser geocodificados depois com `python batch_geocode.py`.")
+        if uploaded is not None and st.button("Importar arquivo"):
+            progress_text = st.empty()
+
+            def show_progress(counts):
+                progress_text.text(f"{counts['lidos']} linhas lidas, {counts['importados']} importadas...")
+
+            summary = import_file(uploaded, detect_format(uploaded.name), progress=show_progress)
+            progress_text.empty()
+            st.success(f"{summary['importados']} imóvel(is) importado(s).")
+            if summary["duplicados"] or summary["invalidos"]:
+                st.info(f"Ignorados: {summary['duplicados']} duplicado(s), {summary['invalidos']} inválido(s) (sem endereço ou ilegíveis).")
+
+    with col_export:
+        st.subheader("Exportar")
+        export_format = st.radio("Formato", FORMATS, horizontal=True, format_func=str.upper)
+        st.download_button(
+            "Baixar todos os imóveis",
+            lambda fmt=export_format: export_to_tempfile(fmt),
+            file_name=f"imoveis.{export_format}",
+            mime="text/csv" if export_format == "csv" else "application/x-ndjson",
+        )
+
+with st.expander("🧬 Possíveis duplicados"):
+    st.caption("Imóveis com a mesma URL, ou com o mesmo endereço ou coordenadas muito próximas e tamanho e preço "
+               "parecidos — em geral o mesmo anúncio publicado em mais de um site.")
+    if st.button("Procurar duplicados"):
+        st.session_state.pares_duplicados = duplicate_index().merge_candidates()
+    pairs = st.session_state.get("pares_duplicados")
+    if pairs is not None:
+        # Pares cujo imóvel já foi excluído somem da lista
+        rows = []
+        for first_id, second_id, reasons in pairs:
+            first, second = get_property(first_id), get_property(second_id)
+            if first is not None and second is not None:
+                rows.append({"id": first_id, "Endereço": first["Endereço"], "Duplicado (id)": second_id,
+                             "Endereço do duplicado": second["Endereço"],
+                             "Motivos": ", ".join(REASONS[r] for r in reasons)})
+        if not rows:
+            st.success("Nenhum duplicado encontrado.")
+        else:
+            st.write(f"{len(rows)} par(es) encontrado(s).")
+            st.dataframe(pd.DataFrame(rows), hide_index=True)
+            duplicate_id = st.selectbox("Excluir o duplicado (mantém o cadastrado primeiro):",
+                                        list(dict.fromkeys(row["Duplicado (id)"] for row in rows)),
+                                        format_func=lambda i: next(f"{i} - {r['Endereço do duplicado']}" for r in rows
+                                                                   if r["Duplicado (id)"] == i))
+            if st.button("Excluir duplicado"):
+                delete_property(duplicate_id)
+                st.rerun()
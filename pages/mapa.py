@@ -1,8 +1,11 @@
 import streamlit as st
-import folium
-from streamlit_folium import st_folium
-from data import load_data
-import pandas as pd
+import metrics
+from data import search_properties, search_query
+from filters import PRICE, cached_map, filter_signature, property_index
+from jobs import failed_geocodes
+from maps import MAP_MODES, build_map, popup_html, property_at
+from spatial import spatial_index
+from utils import geocode_address
 
 st.set_page_config(
     page_title="Mapa de Imóveis",
@@ -12,20 +15,25 @@ st.set_page_config(
 
 st.title("Mapa de Imóveis")
 
-df = load_data()
+index = property_index()
+df = index.df
 
 if not df.empty:
     st.sidebar.header("Filtros do Mapa")
 
-    # Filtro por preço
-    min_price, max_price = float(df["Preço do Aluguel (R$)"].min()), float(df["Preço do Aluguel (R$)"].max())
-    
-    # Ensure min_value is less than max_value for sliders
-    if min_price == max_price:
+    # Filtro por preço. Sem nenhum valor informado (ex.: importação sem preços) o filtro
+    # não é exibido nem aplicado; o mesmo vale para quartos e qualidade
+    price_bounds = index.bounds(PRICE)
+    if price_bounds is None:
+        price_range = None
+        st.sidebar.caption("Nenhum imóvel com preço informado.")
+    elif price_bounds[0] == price_bounds[1]:
+        min_price = float(price_bounds[0])
         # If all properties have the same price, create a range around it
         price_range = (min_price - 100, min_price + 100)
         st.sidebar.info(f"Todos os imóveis têm o mesmo preço: R$ {min_price:,.0f}")
     else:
+        min_price, max_price = map(float, price_bounds)
         price_range = st.sidebar.slider(
             "Faixa de Preço (R$)",
             min_value=min_price,
@@ -35,13 +43,17 @@ if not df.empty:
         )
 
     # Filtro por número de quartos
-    min_quartos, max_quartos = int(df["Quartos"].min()), int(df["Quartos"].max())
-    
-    if min_quartos == max_quartos:
+    rooms_bounds = index.bounds("Quartos")
+    if rooms_bounds is None:
+        quartos_range = None
+        st.sidebar.caption("Nenhum imóvel com número de quartos informado.")
+    elif rooms_bounds[0] == rooms_bounds[1]:
+        min_quartos = int(rooms_bounds[0])
         # If all properties have the same number of rooms, create a range around it
         quartos_range = (max(0, min_quartos - 1), min_quartos + 1)
         st.sidebar.info(f"Todos os imóveis têm {min_quartos} quarto(s)")
     else:
+        min_quartos, max_quartos = map(int, rooms_bounds)
         quartos_range = st.sidebar.slider(
             "Número de Quartos",
             min_value=min_quartos,
@@ -51,13 +63,17 @@ if not df.empty:
         )
 
     # Filtro por avaliação de qualidade
-    min_qualidade, max_qualidade = int(df["Qualidade"].min()), int(df["Qualidade"].max())
-    
-    if min_qualidade == max_qualidade:
+    quality_bounds = index.bounds("Qualidade")
+    if quality_bounds is None:
+        qualidade_range = None
+        st.sidebar.caption("Nenhum imóvel com qualidade informada.")
+    elif quality_bounds[0] == quality_bounds[1]:
+        min_qualidade = max_qualidade = int(quality_bounds[0])
         # If all properties have the same quality, create a range around it
         qualidade_range = (max(1, min_qualidade - 1), min(5, max_qualidade + 1))
         st.sidebar.info(f"Todos os imóveis têm {min_qualidade} estrela(s)")
     else:
+        min_qualidade, max_qualidade = map(int, quality_bounds)
         qualidade_range = st.sidebar.slider(
             "Avaliação de Qualidade (estrelas)",
             min_value=min_qualidade,
@@ -66,42 +82,74 @@ if not df.empty:
             step=1
         )
 
-    # Aplicar filtros
-    filtered_df = df[
-        (df["Preço do Aluguel (R$)"] >= price_range[0]) &
-        (df["Preço do Aluguel (R$)"] <= price_range[1]) &
-        (df["Quartos"] >= quartos_range[0]) &
-        (df["Quartos"] <= quartos_range[1]) &
-        (df["Qualidade"] >= qualidade_range[0]) &
-        (df["Qualidade"] <= qualidade_range[1])
-    ]
+    # Aplicar filtros (buscas binárias nos índices ordenados)
+    ranges = {
+        col: value_range
+        for col, value_range in [(PRICE, price_range), ("Quartos", quartos_range), ("Qualidade", qualidade_range)]
+        if value_range is not None
+    }
+    filtered_df = index.filter(ranges)
+
+    # Busca por palavras (índice de texto completo do banco)
+    search = st.sidebar.text_input("🔎 Buscar", placeholder="Ex.: varanda, metrô, nome da rua",
+                                   help="Procura no endereço e nas observações, sem diferenciar acentos.")
+    if search_query(search):
+        filtered_df = filtered_df[filtered_df.index.isin(search_properties(search))]
+
+    # Filtro por proximidade de um endereço (índice espacial em grade)
+    with st.sidebar.expander("📍 Perto de um endereço"):
+        near_address = st.text_input("Endereço de referência")
+        near_km = st.slider("Raio (km)", min_value=0.5, max_value=20.0, value=1.5, step=0.5)
+
+    reference = None
+    if near_address:
+        near_lat, near_lon = geocode_address(near_address)
+        if near_lat is not None:
+            reference = (near_lat, near_lon, near_km)
+            nearby_ids = [property_id for property_id, _ in spatial_index().radius(near_lat, near_lon, near_km)]
+            filtered_df = filtered_df[filtered_df.index.isin(nearby_ids)]
+
+    # Imóveis recém-cadastrados ficam sem coordenadas até a geocodificação em segundo plano terminar
+    pending_coords = filtered_df["Latitude"].isna() | filtered_df["Longitude"].isna()
+    if pending_coords.any():
+        # Distingue quem ainda espera a tarefa de quem teve a geocodificação falha
+        failed_ids = {job["imovel_id"] for job in failed_geocodes()}
+        failed_count = int(filtered_df.index[pending_coords].isin(failed_ids).sum())
+        waiting = int(pending_coords.sum()) - failed_count
+        parts = []
+        if waiting:
+            parts.append(f"{waiting} aguardando geocodificação")
+        if failed_count:
+            parts.append(f"{failed_count} com falha na geocodificação (veja Cadastrar Imóvel)")
+        st.caption(f"{int(pending_coords.sum())} imóvel(is) sem coordenadas não aparecem no mapa: {', '.join(parts)}.")
+        filtered_df = filtered_df[~pending_coords]
+
+    map_mode = st.sidebar.selectbox(
+        "Modo do mapa",
+        MAP_MODES,
+        help="No modo automático, conjuntos grandes são agrupados ou exibidos como mapa de calor.",
+    )
 
     if not filtered_df.empty:
-        # Centralizar o mapa na média das coordenadas dos imóveis filtrados
-        map_center = [filtered_df["Latitude"].mean(), filtered_df["Longitude"].mean()]
-        m = folium.Map(location=map_center, zoom_start=12)
-
-        for index, row in filtered_df.iterrows():
-            # Build popup HTML with URL if available
-            popup_html = f"""
-                <b>Endereço:</b> {row["Endereço"]}<br>
-                <b>Preço:</b> R$ {row["Preço do Aluguel (R$)"]:,}<br>
-                <b>Quartos:</b> {int(row["Quartos"])}<br>
-                <b>Banheiros:</b> {int(row["Banheiros"])}<br>
-                <b>Qualidade:</b> {int(row["Qualidade"])} estrelas
-            """
-            
-            # Add URL to popup if available
-            if "URL" in row and pd.notna(row["URL"]) and row["URL"] != "":
-                popup_html += f'<br><b>URL:</b> <a href="{row["URL"]}" target="_blank">Ver anúncio</a>'
-            
-            folium.Marker(
-                location=[row["Latitude"], row["Longitude"]],
-                popup=folium.Popup(popup_html, max_width=300),
-                icon=folium.Icon(color="blue" if row["Qualidade"] >= 4 else "green" if row["Qualidade"] >= 2 else "red")
-            ).add_to(m)
-
-        st_folium(m, width=1000, height=600)
+        # Voltar a um filtro já usado reaproveita o mapa construído
+        m = cached_map(
+            index,
+            filter_signature(ranges, map_mode, reference, search_query(search)),
+            lambda: build_map(filtered_df, map_mode, reference),
+        )
+        # Carregado só aqui: os filtros aparecem antes de o componente do mapa ser importado
+        from streamlit_folium import st_folium
+
+        # Only clicks trigger a rerun; panning/zooming stays in the browser
+        with metrics.span("st_folium"):
+            map_state = st_folium(m, width=1000, height=600, returned_objects=["last_object_clicked"])
+
+        # Detalhes carregados sob demanda ao clicar em um ponto
+        clicked = (map_state or {}).get("last_object_clicked") or {}
+        selected = property_at(filtered_df, clicked.get("lat"), clicked.get("lng"))
+        if selected is not None:
+            st.subheader("Imóvel selecionado")
+            st.markdown(popup_html(selected), unsafe_allow_html=True)
     else:
         st.info("Nenhum imóvel encontrado com os filtros selecionados.")
 else:
@@ -1,39 +1,325 @@
-import requests
-from bs4 import BeautifulSoup
-from groq import Groq
+import hashlib
 import json
+import logging
 import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import date
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
+import http_client
+import metrics
+from structured_data import extract_structured_data, missing_fields
+
+if TYPE_CHECKING:
+    import requests  # só nas anotações; o import real fica em http_client, na primeira chamada
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_MODEL = "llama3-8b-8192" # Using a smaller, faster model for extraction
+# Bump whenever the prompt changes so cached extractions from the old prompt are ignored
+PROMPT_VERSION = 1
+EXTRACTION_CACHE_MAX_ENTRIES = 1000
+
+# Token budget for the page text pasted into the prompt. llama3-8b-8192 has an 8192-token
+# context; this leaves room for the instructions and the JSON answer.
+TEXT_TOKEN_BUDGET = 3000
+
+_RELEVANT_META = {
+    "description", "og:title", "og:description", "og:street-address", "og:locality",
+    "product:price:amount", "twitter:title", "twitter:description",
+}
+_RELEVANT_KEYWORDS = [
+    "r$", "aluguel", "condomínio", "condominio", "iptu", "m²", "m2", "quarto", "dormit",
+    "banheiro", "suíte", "suite", "vaga", "garagem", "rua ", "avenida", "av.", "bairro",
+    "endereço", "cep", "área", "area", "apartamento", "casa", "sobrado", "kitnet", "mobiliado",
+]
+# Palavras inteiras de id/classe (separadas por espaço, "-" ou "_"). Termos genéricos como
+# header, banner, share ou related ficam de fora: aparecem em blocos do próprio anúncio
+# (listing-header, price-header...)
+_BOILERPLATE_PATTERN = re.compile(
+    r"(?:^|[\s_-])(nav|navbar|navigation|menu|footer|breadcrumbs?|cookies?|carousel|recommend(?:ed|ations?)?|"
+    r"similar|newsletter|social|login|signup|modal|advert(?:isement)?s?|ads)(?:$|[\s_-])"
+)
+_reduction_lock = threading.Lock()
+_reduction_totals = {"pages": 0, "tokens_before": 0, "tokens_after": 0}
+
+# Default concurrency for batch ingestion
+FETCH_WORKERS = 16
+EXTRACT_WORKERS = 4
+PER_HOST_LIMIT = 4
+
+@metrics.timed("fetch_page_html")
+def fetch_page_html(url: str, session: "requests.Session" = None) -> str:
+    """Fetches the raw HTML of a web page, or "" on failure."""
+    import requests
 
-def get_page_content(url: str) -> str:
-    """Fetches the content of a web page and extracts its plain text."""
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
-        response = requests.get(url, headers=headers, timeout=10)
+        response = http_client.get(url, session=session, headers=headers)
         response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        # Remove script and style elements
-        for script_or_style in soup(['script', 'style']):
-            script_or_style.extract()
-        text_content = soup.get_text(separator=' ', strip=True)
-        return text_content
+        return response.text
     except requests.exceptions.RequestException as e:
-        print(f"Error fetching URL {url}: {e}")
+        logger.warning("Error fetching URL %s: %s", url, e)
+        metrics.inc("falhas fetch_page_html")
         return ""
-    except Exception as e:
-        print(f"An unexpected error occurred while processing {url}: {e}")
+    except Exception:
+        logger.exception("An unexpected error occurred while processing %s", url)
+        metrics.inc("falhas fetch_page_html")
         return ""
 
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting prompts."""
+    return (len(text) + 3) // 4
+
+
+def _structured_blocks(soup) -> list:
+    """Title, JSON-LD and meta/OpenGraph descriptions: the densest sources of listing data."""
+    blocks = []
+    if soup.title and soup.title.string:
+        blocks.append(soup.title.string.strip())
+    for script in soup.find_all("script", type="application/ld+json"):
+        raw = script.string or script.get_text()
+        try:
+            blocks.append(json.dumps(json.loads(raw), ensure_ascii=False, separators=(",", ":")))
+        except (ValueError, TypeError):
+            continue
+    for meta in soup.find_all("meta"):
+        name = (meta.get("property") or meta.get("name") or "").lower()
+        content = (meta.get("content") or "").strip()
+        if content and name in _RELEVANT_META:
+            blocks.append(f"{name}: {content}")
+    return blocks
+
+
+def _score_line(line: str) -> int:
+    lowered = line.lower()
+    score = sum(2 for keyword in _RELEVANT_KEYWORDS if keyword in lowered)
+    if any(ch.isdigit() for ch in line):
+        score += 1
+    return score
+
+
+def reduce_page_text(html: str, token_budget: int = TEXT_TOKEN_BUDGET) -> tuple:
+    """
+    Reduces a page to the text most likely to describe the listing, within token_budget.
+
+    Structured blocks (title, JSON-LD, meta tags) come first. Navigation, page-level
+    headers/footers, carousels and similar chrome are dropped, and the remaining lines
+    are kept by relevance score (prices, areas, rooms, addresses...) in their original
+    order. Returns (text, stats) where stats has the token estimates before and after,
+    both counting the structured blocks plus the page text.
+    """
+    from bs4 import BeautifulSoup  # adiado: só carrega ao processar uma página
+
+    soup = BeautifulSoup(html, 'html.parser')
+    structured = _structured_blocks(soup)
+
+    # Remove script and style elements
+    for element in soup(['script', 'style', 'noscript', 'svg', 'iframe']):
+        element.extract()
+    tokens_before = estimate_tokens("\n".join(structured + [soup.get_text(separator=' ', strip=True)]))
+
+    for element in soup(['nav', 'aside', 'form']):
+        element.extract()
+    # <header>/<footer> de um <article>/<main> costumam trazer título, preço e endereço
+    for element in soup(['header', 'footer']):
+        if element.find_parent(['article', 'main']) is None:
+            element.extract()
+    for element in soup.find_all(True):
+        marker = " ".join([element.get("id") or ""] + list(element.get("class") or [])).lower()
+        if marker and _BOILERPLATE_PATTERN.search(marker):
+            element.extract()
+
+    selected, used = [], 0
+    structured_budget = token_budget // 2
+    for block in structured:
+        cost = estimate_tokens(block)
+        if used + cost > structured_budget:
+            block = block[:max(0, (structured_budget - used) * 4)]
+            cost = estimate_tokens(block)
+        if block:
+            selected.append(block)
+            used += cost
+
+    seen = set(selected)
+    lines = []
+    for position, line in enumerate(soup.get_text(separator='\n', strip=True).splitlines()):
+        line = " ".join(line.split())
+        if len(line) < 2 or line in seen:
+            continue
+        seen.add(line)
+        lines.append((position, line))
+
+    # Highest-scoring lines first (stable, so ties keep page order), then restore page order
+    kept = []
+    for position, line in sorted(lines, key=lambda item: -_score_line(item[1])):
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget:
+            continue
+        kept.append((position, line))
+        used += cost
+    selected.extend(line for _, line in sorted(kept))
+
+    text = "\n".join(selected)
+    stats = {"tokens_before": tokens_before, "tokens_after": estimate_tokens(text)}
+    with _reduction_lock:
+        _reduction_totals["pages"] += 1
+        _reduction_totals["tokens_before"] += stats["tokens_before"]
+        _reduction_totals["tokens_after"] += stats["tokens_after"]
+    return text, stats
+
+
+def text_reduction_stats() -> dict:
+    """Totals of estimated prompt tokens before/after reduce_page_text in this process."""
+    with _reduction_lock:
+        totals = dict(_reduction_totals)
+    totals["reduction"] = 1 - totals["tokens_after"] / totals["tokens_before"] if totals["tokens_before"] else 0.0
+    return totals
+
+
+@metrics.timed("get_page_content")
+def get_page_content(url: str, session: "requests.Session" = None, token_budget: int = TEXT_TOKEN_BUDGET) -> str:
+    """Fetches a web page and returns its listing-relevant text, reduced to token_budget."""
+    html = fetch_page_html(url, session=session)
+    if not html:
+        return ""
+    try:
+        text_content, _ = reduce_page_text(html, token_budget=token_budget)
+        return text_content
+    except Exception:
+        logger.exception("An unexpected error occurred while processing %s", url)
+        metrics.inc("falhas get_page_content")
+        return ""
+
+def normalize_property_data(extracted_data: dict) -> dict:
+    """Coerces the extracted fields to the types and defaults the rest of the app expects."""
+    extracted_data = dict(extracted_data)
+
+    # Ensure numerical fields are correctly typed
+    for key in ["Tamanho (m²)", "Preço do Aluguel (R$)"]:
+        if key in extracted_data and extracted_data[key] is not None:
+            try:
+                extracted_data[key] = float(extracted_data[key])
+            except (ValueError, TypeError):
+                extracted_data[key] = None # Or a default value
+
+    for key in ["Quartos", "Banheiros", "Qualidade"]:
+        if key in extracted_data and extracted_data[key] is not None:
+            try:
+                extracted_data[key] = int(extracted_data[key])
+            except (ValueError, TypeError):
+                extracted_data[key] = None # Or a default value
+
+    # Ensure Data da Visita is in YYYY-MM-DD format
+    if "Data da Visita" not in extracted_data or not extracted_data["Data da Visita"]:
+        extracted_data["Data da Visita"] = date.today().strftime("%Y-%m-%d")
+
+    # Ensure Qualidade is within 1-5 range
+    if "Qualidade" in extracted_data and extracted_data["Qualidade"] is not None:
+        extracted_data["Qualidade"] = max(1, min(5, extracted_data["Qualidade"]))
+    else:
+        extracted_data["Qualidade"] = 3 # Default quality
+
+    return extracted_data
+
+
+def _extraction_cache_key(text_content: str) -> str:
+    payload = f"{EXTRACTION_MODEL}\0{PROMPT_VERSION}\0{text_content}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _count_extraction(conn, name: str, amount: int = 1):
+    conn.execute(
+        "INSERT INTO extraction_cache_stats (nome, valor) VALUES (?, ?) "
+        "ON CONFLICT(nome) DO UPDATE SET valor = valor + excluded.valor",
+        (name, amount),
+    )
+
+
+def _cached_extraction(key: str):
+    from data import get_connection
+
+    conn = get_connection()
+    try:
+        with conn:
+            row = conn.execute("SELECT dados, tokens FROM extraction_cache WHERE chave = ?", (key,)).fetchone()
+            if row is None:
+                _count_extraction(conn, "misses")
+                return None
+            conn.execute(
+                "UPDATE extraction_cache SET acertos = acertos + 1, usado_em = ? WHERE chave = ?",
+                (time.time(), key),
+            )
+            _count_extraction(conn, "hits")
+            _count_extraction(conn, "tokens_saved", row[1] or 0)
+            return json.loads(row[0])
+    finally:
+        conn.close()
+
+
+def _store_extraction(key: str, extracted_data: dict, tokens: int):
+    from data import get_connection
+
+    now = time.time()
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO extraction_cache (chave, modelo, dados, tokens, acertos, criado_em, usado_em) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?)",
+                (key, EXTRACTION_MODEL, json.dumps(extracted_data, ensure_ascii=False), tokens, now, now),
+            )
+            # LRU eviction: keep only the most recently used entries
+            conn.execute(
+                "DELETE FROM extraction_cache WHERE chave NOT IN "
+                "(SELECT chave FROM extraction_cache ORDER BY usado_em DESC LIMIT ?)",
+                (EXTRACTION_CACHE_MAX_ENTRIES,),
+            )
+    finally:
+        conn.close()
+
+
+def extraction_cache_stats() -> dict:
+    """Returns hit/miss counters, hit rate and LLM tokens saved by the extraction cache."""
+    from data import get_connection
+
+    conn = get_connection()
+    try:
+        counters = dict(conn.execute("SELECT nome, valor FROM extraction_cache_stats").fetchall())
+        entries = conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+    finally:
+        conn.close()
+    hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+    return {
+        "entries": entries,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        "tokens_saved": counters.get("tokens_saved", 0),
+    }
+
+
+@metrics.timed("extract_property_data")
 def extract_property_data(text_content: str, groq_api_key: str) -> dict:
     """
     Uses Groq LLM to extract property data from text content.
+    Results are cached by a hash of the text, model and prompt version.
     """
     if not text_content:
         return {}
 
-    client = Groq(api_key=groq_api_key)
+    cache_key = _extraction_cache_key(text_content)
+    cached = _cached_extraction(cache_key)
+    if cached is not None:
+        return normalize_property_data(cached)
+
+    client = http_client.groq_client(groq_api_key)
 
     prompt = f"""
     You are an expert real estate data extractor. Your task is to extract specific property details from the provided text content.
@@ -68,54 +354,146 @@ def extract_property_data(text_content: str, groq_api_key: str) -> dict:
     """
 
     try:
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model="llama3-8b-8192", # Using a smaller, faster model for extraction
-            response_format={"type": "json_object"},
-            temperature=0.0, # Keep temperature low for factual extraction
-        )
+        with http_client.track("groq"):
+            chat_completion = client.chat.completions.create(
+                messages=[
+                    {
+                        "role": "user",
+                        "content": prompt,
+                    }
+                ],
+                model=EXTRACTION_MODEL,
+                response_format={"type": "json_object"},
+                temperature=0.0, # Keep temperature low for factual extraction
+            )
         response_content = chat_completion.choices[0].message.content
         extracted_data = json.loads(response_content)
 
-        # Ensure numerical fields are correctly typed
-        for key in ["Tamanho (m²)", "Preço do Aluguel (R$)"]:
-            if key in extracted_data and extracted_data[key] is not None:
-                try:
-                    extracted_data[key] = float(extracted_data[key])
-                except (ValueError, TypeError):
-                    extracted_data[key] = None # Or a default value
-
-        for key in ["Quartos", "Banheiros", "Qualidade"]:
-            if key in extracted_data and extracted_data[key] is not None:
-                try:
-                    extracted_data[key] = int(extracted_data[key])
-                except (ValueError, TypeError):
-                    extracted_data[key] = None # Or a default value
-
-        # Ensure Data da Visita is in YYYY-MM-DD format
-        if "Data da Visita" not in extracted_data or not extracted_data["Data da Visita"]:
-            extracted_data["Data da Visita"] = date.today().strftime("%Y-%m-%d")
-        
-        # Ensure Qualidade is within 1-5 range
-        if "Qualidade" in extracted_data and extracted_data["Qualidade"] is not None:
-            extracted_data["Qualidade"] = max(1, min(5, extracted_data["Qualidade"]))
-        else:
-            extracted_data["Qualidade"] = 3 # Default quality
-
-        return extracted_data
+        usage = getattr(chat_completion, "usage", None)
+        _store_extraction(cache_key, extracted_data, getattr(usage, "total_tokens", 0) or 0)
+        return normalize_property_data(extracted_data)
 
     except json.JSONDecodeError as e:
-        print(f"Error decoding JSON from LLM response: {e}")
-        print(f"LLM Raw Response: {response_content}")
+        logger.warning("Error decoding JSON from LLM response: %s\nLLM Raw Response: %s", e, response_content)
+        metrics.inc("falhas extract_property_data")
         return {}
     except Exception as e:
-        print(f"Error during LLM extraction: {e}")
+        logger.warning("Error during LLM extraction: %s", e)
+        metrics.inc("falhas extract_property_data")
+        return {}
+
+def extract_listing(html: str, groq_api_key: str = None, url: str = None) -> dict:
+    """
+    Extracts property data from a listing page, using the LLM only when needed.
+
+    Structured data (JSON-LD, meta tags, site-specific page state) is parsed first; when it
+    already has every required field no API call is made. Otherwise the reduced page text
+    goes to extract_property_data and the structured values override the LLM's answers.
+    """
+    if not html:
         return {}
+    structured = extract_structured_data(html, url)
+    if not missing_fields(structured) or not groq_api_key:
+        return normalize_property_data(structured) if structured else {}
+
+    text_content, _ = reduce_page_text(html)
+    extracted = extract_property_data(text_content, groq_api_key)
+    merged = dict(extracted)
+    merged.update(structured)
+    return normalize_property_data(merged) if merged else {}
+
+
+class _HostLimiter:
+    """Caps how many requests run at the same time against each host."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.semaphores = {}
+
+    def __call__(self, url: str) -> threading.Semaphore:
+        host = urlparse(url).netloc.lower()
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(self.limit)
+            return self.semaphores[host]
+
+
+def _geocode_and_save(url: str, extracted: dict, limiter, session: "requests.Session") -> dict:
+    from batch_geocode import geocode_one
+    from data import insert_property
+    from utils import get_cached_geocode, store_cached_geocode
+
+    address = extracted.get("Endereço")
+    if not address:
+        return {"url": url, "ok": False, "error": "Endereço não extraído", "data": extracted}
+    coords = get_cached_geocode(address)
+    if coords is None:
+        try:
+            coords = geocode_one(address, session, limiter)
+        except Exception as e:
+            return {"url": url, "ok": False, "error": f"Erro de geocodificação: {e}", "data": extracted}
+        store_cached_geocode(address, *coords)
+    if coords[0] is None:
+        return {"url": url, "ok": False, "error": "Endereço não encontrado", "data": extracted}
+
+    record = dict(extracted, Latitude=coords[0], Longitude=coords[1], URL=url)
+    return {"url": url, "ok": True, "id": insert_property(record), "data": record}
+
+
+def ingest_urls(urls, groq_api_key: str, fetch_workers: int = FETCH_WORKERS,
+                extract_workers: int = EXTRACT_WORKERS, per_host_limit: int = PER_HOST_LIMIT,
+                save: bool = True, geocode_rate: float = None):
+    """
+    Fetches, extracts and (optionally) geocodes and saves many listing URLs concurrently.
+
+    Pages are downloaded by a thread pool sharing one pooled session, with at most
+    `per_host_limit` requests in flight per host; each downloaded page is handed to a
+    separate pool of `extract_workers` LLM calls. Geocoding is limited to geocode_rate
+    requests per second (default: the public Nominatim's 1 req/s). Results are yielded
+    as soon as each URL finishes, as dicts with "url", "ok", "error" and, on success,
+    "data"/"id".
+    """
+    from batch_geocode import DEFAULT_RATE, TokenBucket
+
+    urls = list(dict.fromkeys(u.strip() for u in urls if u and u.strip()))
+    host_limiter = _HostLimiter(per_host_limit)
+    geocode_limiter = TokenBucket(rate=geocode_rate or DEFAULT_RATE)
+    session = http_client.pooled_session(fetch_workers)
+
+    def fetch(url):
+        with host_limiter(url):
+            return fetch_page_html(url, session=session)
+
+    with session, \
+            ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool, \
+            ThreadPoolExecutor(max_workers=extract_workers) as extract_pool:
+        fetches = {fetch_pool.submit(fetch, url): url for url in urls}
+        extractions = {}
+        pending = set(fetches)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in fetches:
+                    url = fetches.pop(future)
+                    html = future.result()
+                    if not html:
+                        yield {"url": url, "ok": False, "error": "Falha ao carregar a página"}
+                        continue
+                    extraction = extract_pool.submit(extract_listing, html, groq_api_key, url)
+                    extractions[extraction] = url
+                    pending.add(extraction)
+                    continue
+
+                url = extractions.pop(future)
+                extracted = future.result()
+                if not extracted:
+                    yield {"url": url, "ok": False, "error": "Falha na extração dos dados"}
+                elif not save:
+                    yield {"url": url, "ok": True, "data": dict(extracted, URL=url)}
+                else:
+                    yield _geocode_and_save(url, extracted, geocode_limiter, session)
+
 
 if __name__ == "__main__":
     # Example Usage (replace with a real URL and your API key)
@@ -123,11 +501,42 @@ if __name__ == "__main__":
     # For testing, you can temporarily set it like:
     # os.environ["GROQ_API_KEY"] = "your_groq_api_key_here"
     
+    #
+    # Batch ingestion: python scraper.py URL [URL ...] or python scraper.py --file urls.txt
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract property data from listing pages")
+    parser.add_argument("urls", nargs="*", help="Listing URLs to ingest")
+    parser.add_argument("--file", help="Text file with one URL per line")
+    parser.add_argument("--no-save", action="store_true", help="Only print the extracted data, don't save it")
+    parser.add_argument("--fetch-workers", type=int, default=FETCH_WORKERS)
+    parser.add_argument("--extract-workers", type=int, default=EXTRACT_WORKERS)
+    parser.add_argument("--per-host", type=int, default=PER_HOST_LIMIT)
+    args = parser.parse_args()
+
+    urls = list(args.urls)
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            urls.extend(line.strip() for line in f if line.strip())
+
     test_url = "https://www.olx.com.br/imoveis/anuncio/apartamento-3-quartos-centro-sp-123456789" # Replace with a real URL
     groq_key = os.getenv("GROQ_API_KEY")
 
     if not groq_key:
         print("GROQ_API_KEY environment variable not set. Please set it to run the example.")
+    elif urls:
+        succeeded = 0
+        for result in ingest_urls(urls, groq_key, fetch_workers=args.fetch_workers,
+                                  extract_workers=args.extract_workers,
+                                  per_host_limit=args.per_host, save=not args.no_save):
+            if result["ok"]:
+                succeeded += 1
+                print(f"OK    {result['url']}" + (f" (id {result['id']})" if "id" in result else ""))
+                if args.no_save:
+                    print(json.dumps(result["data"], indent=2, ensure_ascii=False))
+            else:
+                print(f"FALHA {result['url']}: {result['error']}")
+        print(f"\n{succeeded}/{len(set(urls))} URLs processed successfully")
     else:
         print(f"Fetching content from: {test_url}")
         content = get_page_content(test_url)
@@ -0,0 +1,151 @@
+import heapq
+import math
+import threading
+
+import numpy as np
+
+from data import DerivedIndex
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Tamanho da célula da grade em graus (~1,1 km de latitude)
+CELL_SIZE = 0.01
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; works element-wise on numpy arrays."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class SpatialIndex(DerivedIndex):
+    """
+    Uniform lat/lon grid over the properties' coordinates.
+
+    Each cell holds the ids inside it, so radius, bounding-box and k-nearest queries only
+    look at the cells around the query instead of every property. Kept up to date
+    incrementally by data.py writes (see data.DerivedIndex).
+    """
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.coords = {}
+        super().__init__()
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def _add(self, property_id, lat, lon):
+        if lat is None or lon is None or math.isnan(lat) or math.isnan(lon):
+            return
+        self.coords[property_id] = (lat, lon)
+        self.cells.setdefault(self._cell(lat, lon), set()).add(property_id)
+
+    def _remove(self, property_id):
+        coords = self.coords.pop(property_id, None)
+        if coords is None:
+            return
+        cell = self._cell(*coords)
+        members = self.cells.get(cell)
+        if members is not None:
+            members.discard(property_id)
+            if not members:
+                del self.cells[cell]
+
+    def rebuild(self, df):
+        self.cells = {}
+        self.coords = {}
+        for property_id, lat, lon in zip(df.index, df["Latitude"].to_numpy(dtype=float), df["Longitude"].to_numpy(dtype=float)):
+            self._add(int(property_id), float(lat), float(lon))
+
+    def apply(self, event, property_id, record):
+        self._remove(property_id)
+        if event != "delete" and record is not None:
+            lat, lon = record.get("Latitude"), record.get("Longitude")
+            self._add(property_id, None if lat is None else float(lat), None if lon is None else float(lon))
+
+    def __len__(self):
+        return len(self.coords)
+
+    def _ids_in_cells(self, min_lat, min_lon, max_lat, max_lon):
+        (lat0, lon0), (lat1, lon1) = self._cell(min_lat, min_lon), self._cell(max_lat, max_lon)
+        ids = []
+        # Iterate over whichever is smaller: the cells in range or the occupied cells
+        if (lat1 - lat0 + 1) * (lon1 - lon0 + 1) <= len(self.cells):
+            for cx in range(lat0, lat1 + 1):
+                for cy in range(lon0, lon1 + 1):
+                    ids.extend(self.cells.get((cx, cy), ()))
+        else:
+            for (cx, cy), members in self.cells.items():
+                if lat0 <= cx <= lat1 and lon0 <= cy <= lon1:
+                    ids.extend(members)
+        return ids
+
+    def _arrays(self, ids):
+        coords = np.array([self.coords[i] for i in ids], dtype=float).reshape(-1, 2)
+        return np.array(ids, dtype=int), coords[:, 0], coords[:, 1]
+
+    def bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """Ids of the properties inside the bounding box."""
+        with self.lock:
+            ids, lats, lons = self._arrays(self._ids_in_cells(min_lat, min_lon, max_lat, max_lon))
+        inside = (lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)
+        return ids[inside].tolist()
+
+    def radius(self, lat, lon, km):
+        """[(id, distance_km)] of the properties within km of the point, nearest first."""
+        dlat = math.degrees(km / EARTH_RADIUS_KM)
+        dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        with self.lock:
+            ids, lats, lons = self._arrays(self._ids_in_cells(lat - dlat, lon - dlon, lat + dlat, lon + dlon))
+        distances = haversine_km(lat, lon, lats, lons)
+        inside = distances <= km
+        order = np.argsort(distances[inside], kind="stable")
+        return list(zip(ids[inside][order].tolist(), distances[inside][order].tolist()))
+
+    def nearest(self, lat, lon, k=5):
+        """[(id, distance_km)] of the k properties closest to the point."""
+        with self.lock:
+            if not self.coords:
+                return []
+            k = min(k, len(self.coords))
+            center = self._cell(lat, lon)
+            # Smallest distance from the point to anything outside ring r is at least r cells
+            cell_km = math.radians(self.cell_size) * EARTH_RADIUS_KM * max(math.cos(math.radians(lat)), 1e-6)
+            candidates = []
+            ring = 0
+            while True:
+                ring_ids = []
+                for cx in range(center[0] - ring, center[0] + ring + 1):
+                    for cy in range(center[1] - ring, center[1] + ring + 1):
+                        if max(abs(cx - center[0]), abs(cy - center[1])) == ring:
+                            ring_ids.extend(self.cells.get((cx, cy), ()))
+                if ring_ids:
+                    ids, lats, lons = self._arrays(ring_ids)
+                    candidates.extend(zip(ids.tolist(), haversine_km(lat, lon, lats, lons).tolist()))
+                if len(candidates) >= k:
+                    best = heapq.nsmallest(k, candidates, key=lambda item: item[1])
+                    if best[-1][1] <= ring * cell_km or len(candidates) == len(self.coords):
+                        return best
+                ring += 1
+                if (2 * ring + 1) ** 2 > 4 * len(self.cells):
+                    # Sparse data far from the point: scanning every property is cheaper than more rings
+                    ids, lats, lons = self._arrays(list(self.coords))
+                    distances = haversine_km(lat, lon, lats, lons)
+                    order = np.argsort(distances, kind="stable")[:k]
+                    return list(zip(ids[order].tolist(), distances[order].tolist()))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def spatial_index():
+    """Process-wide SpatialIndex over the store, up to date with the latest writes."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SpatialIndex()
+    return _index.current()
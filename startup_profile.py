@@ -0,0 +1,105 @@
+"""
+Startup profiling: how long each page takes to render in a fresh process and which
+imports that time goes to.
+
+Each page runs headless (streamlit.testing) in its own interpreter with -X importtime.
+Streamlit itself is imported before the clock starts, so the report shows only what
+the page pulls in. Exits with status 1 if app.py misses the cold-start target.
+
+    python startup_profile.py              # todas as páginas
+    python startup_profile.py pages/mapa.py --top 15
+    python startup_profile.py --json
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+
+# Meta de primeira renderização do app.py num processo novo (segundos)
+COLD_START_TARGET = 1.0
+
+_CHILD = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+sys.stderr.write("import time: --- page start ---\\n")
+start = time.perf_counter()
+app = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "exceptions": [e.message for e in app.exception]}))
+"""
+
+
+def default_pages():
+    return ["app.py"] + sorted(glob.glob(os.path.join("pages", "*.py")))
+
+
+def parse_importtime(stderr):
+    """[(module, cumulative_ms)] of the top-level imports done after the page started."""
+    started = False
+    imports = []
+    for line in stderr.splitlines():
+        if "--- page start ---" in line:
+            started = True
+            continue
+        if not started or not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue
+        # Só os imports de primeiro nível: os aninhados já estão no cumulativo do pai
+        if name.startswith(" ") and not name.startswith("  "):
+            imports.append((name.strip(), int(cumulative) / 1000))
+    return imports
+
+
+def profile_page(path):
+    """Renders path in a fresh interpreter and returns its timing and import breakdown."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD, path],
+        capture_output=True, text=True, env={**os.environ, "PYTHONWARNINGS": "ignore"},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{path}: {result.stderr.strip().splitlines()[-1:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    imports = sorted(parse_importtime(result.stderr), key=lambda item: item[1], reverse=True)
+    report.update({
+        "page": path,
+        "import_ms": sum(ms for _, ms in imports),
+        "imports": imports,
+    })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de inicialização das páginas")
+    parser.add_argument("pages", nargs="*", help="Páginas a medir (padrão: app.py e pages/*.py)")
+    parser.add_argument("--top", type=int, default=8, help="Quantos imports mostrar por página")
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    reports = [profile_page(page) for page in args.pages or default_pages()]
+    if args.json:
+        print(json.dumps(reports, indent=2, ensure_ascii=False))
+    else:
+        for report in reports:
+            print(f"{report['page']}: {report['seconds']:.2f} s até a primeira renderização "
+                  f"({report['import_ms']:.0f} ms em imports)")
+            for name, ms in report["imports"][:args.top]:
+                print(f"    {ms:8.1f} ms  {name}")
+            for message in report["exceptions"]:
+                print(f"    ERRO: {message}")
+
+    app = next((r for r in reports if r["page"] == "app.py"), None)
+    if app is not None:
+        met = app["seconds"] <= COLD_START_TARGET
+        if not args.json:
+            print(f"\nMeta de cold start do app.py: {COLD_START_TARGET:.1f} s — "
+                  f"{'OK' if met else 'NÃO ATINGIDA'} ({app['seconds']:.2f} s)")
+        if not met:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import bisect
+import math
+import threading
+from collections import Counter
+
+from data import DerivedIndex
+
+PRICE = "Preço do Aluguel (R$)"
+SIZE = "Tamanho (m²)"
+TOP_K = 10
+
+
+def _number(value):
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def _quantile(values, q):
+    """Linear-interpolated quantile of an already sorted list (same as numpy's default)."""
+    if not values:
+        return None
+    position = (len(values) - 1) * q
+    low = math.floor(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+class StatsIndex(DerivedIndex):
+    """
+    Statistics for the statistics page, maintained incrementally on every write.
+
+    Keeps running counts and sums, the sorted prices of each quality level (exact
+    quantiles by position), the number of properties per room count, a ranking ordered
+    by quality and the URL coverage. Each write only adjusts the contribution of the
+    property it touched, so reading the statistics never scans the table.
+    """
+
+    def __init__(self):
+        self._reset()
+        super().__init__()
+
+    def _reset(self):
+        self.rows = {}
+        self.count = 0
+        self.price_sum = 0.0
+        self.price_count = 0
+        self.size_sum = 0.0
+        self.size_count = 0
+        self.prices_by_quality = {}
+        self.rooms = Counter()
+        self.ranking = []
+        self.url_count = 0
+        self.url_quality_sum = 0.0
+
+    def _add(self, property_id, record):
+        row = {
+            "Endereço": record.get("Endereço") or "",
+            "Qualidade": _number(record.get("Qualidade")),
+            PRICE: _number(record.get(PRICE)),
+            SIZE: _number(record.get(SIZE)),
+            "Quartos": _number(record.get("Quartos")),
+            "URL": bool(str(record.get("URL") or "").strip()),
+        }
+        self.rows[property_id] = row
+        self.count += 1
+        if row[PRICE] is not None:
+            self.price_sum += row[PRICE]
+            self.price_count += 1
+            if row["Qualidade"] is not None:
+                bisect.insort(self.prices_by_quality.setdefault(int(row["Qualidade"]), []), row[PRICE])
+        if row[SIZE] is not None:
+            self.size_sum += row[SIZE]
+            self.size_count += 1
+        if row["Quartos"] is not None:
+            self.rooms[int(row["Quartos"])] += 1
+        bisect.insort(self.ranking, (-(row["Qualidade"] or 0), property_id))
+        if row["URL"]:
+            self.url_count += 1
+            self.url_quality_sum += row["Qualidade"] or 0
+
+    def _remove(self, property_id):
+        row = self.rows.pop(property_id, None)
+        if row is None:
+            return
+        self.count -= 1
+        if row[PRICE] is not None:
+            self.price_sum -= row[PRICE]
+            self.price_count -= 1
+            if row["Qualidade"] is not None:
+                prices = self.prices_by_quality[int(row["Qualidade"])]
+                del prices[bisect.bisect_left(prices, row[PRICE])]
+                if not prices:
+                    del self.prices_by_quality[int(row["Qualidade"])]
+        if row[SIZE] is not None:
+            self.size_sum -= row[SIZE]
+            self.size_count -= 1
+        if row["Quartos"] is not None:
+            self.rooms[int(row["Quartos"])] -= 1
+            if self.rooms[int(row["Quartos"])] <= 0:
+                del self.rooms[int(row["Quartos"])]
+        key = (-(row["Qualidade"] or 0), property_id)
+        del self.ranking[bisect.bisect_left(self.ranking, key)]
+        if row["URL"]:
+            self.url_count -= 1
+            self.url_quality_sum -= row["Qualidade"] or 0
+
+    def rebuild(self, df):
+        self._reset()
+        for property_id, record in zip(df.index, df.to_dict("records")):
+            self._add(int(property_id), record)
+
+    def apply(self, event, property_id, record):
+        self._remove(property_id)
+        if event != "delete" and record is not None:
+            self._add(property_id, record)
+
+    def summary(self):
+        """Totals and means shown at the top of the statistics page."""
+        with self.lock:
+            return {
+                "total": self.count,
+                "preco_medio": self.price_sum / self.price_count if self.price_count else None,
+                "tamanho_medio": self.size_sum / self.size_count if self.size_count else None,
+                "melhor_qualidade": -self.ranking[0][0] if self.ranking else None,
+                "com_url": self.url_count,
+                "qualidade_media_url": self.url_quality_sum / self.url_count if self.url_count else None,
+            }
+
+    def price_box_by_quality(self):
+        """Box-plot statistics of the price for each quality level (Tukey 1.5 IQR whiskers)."""
+        boxes = []
+        with self.lock:
+            for quality in sorted(self.prices_by_quality):
+                prices = self.prices_by_quality[quality]
+                q1, median, q3 = (_quantile(prices, q) for q in (0.25, 0.5, 0.75))
+                iqr = q3 - q1
+                lower = prices[bisect.bisect_left(prices, q1 - 1.5 * iqr)]
+                upper = prices[bisect.bisect_right(prices, q3 + 1.5 * iqr) - 1]
+                outliers = prices[:bisect.bisect_left(prices, lower)] + prices[bisect.bisect_right(prices, upper):]
+                boxes.append({
+                    "Qualidade": quality, "q1": q1, "median": median, "q3": q3,
+                    "lowerfence": lower, "upperfence": upper, "outliers": outliers,
+                })
+        return boxes
+
+    def rooms_histogram(self):
+        """[(quartos, contagem)] ordered by number of rooms."""
+        with self.lock:
+            return sorted(self.rooms.items())
+
+    def top(self, k=TOP_K):
+        """The k best rated properties as [(id, row)], best first."""
+        with self.lock:
+            return [(property_id, dict(self.rows[property_id])) for _, property_id in self.ranking[:k]]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def stats_index():
+    """Process-wide StatsIndex, up to date with the latest writes."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = StatsIndex()
+    return _index.current()
@@ -0,0 +1,279 @@
+import json
+import re
+from urllib.parse import urlparse
+
+
+# Campos que, se todos presentes, dispensam a chamada ao LLM
+REQUIRED_FIELDS = ["Endereço", "Tamanho (m²)", "Quartos", "Banheiros", "Preço do Aluguel (R$)"]
+
+# Chaves procuradas nos dados embutidos (__NEXT_DATA__, initial-data...) de cada site.
+# Cada campo lista nomes de chave candidatos, do mais para o menos específico.
+SITE_KEYS = {
+    "olx": {
+        "Preço do Aluguel (R$)": ["priceValue", "price"],
+        "Tamanho (m²)": ["size", "area"],
+        "Quartos": ["rooms"],
+        "Banheiros": ["bathrooms"],
+        "Observações": ["body", "description"],
+    },
+    "zap": {
+        "Preço do Aluguel (R$)": ["rentalPrice", "price"],
+        "Tamanho (m²)": ["usableAreas", "totalAreas"],
+        "Quartos": ["bedrooms"],
+        "Banheiros": ["bathrooms"],
+        "Observações": ["description"],
+    },
+    "quintoandar": {
+        "Preço do Aluguel (R$)": ["rentPrice", "rent", "totalCost"],
+        "Tamanho (m²)": ["area"],
+        "Quartos": ["bedrooms"],
+        "Banheiros": ["bathrooms"],
+        "Observações": ["remarks", "description"],
+    },
+}
+SITE_KEYS["vivareal"] = SITE_KEYS["zap"]  # Mesmo grupo e mesmo formato de página
+
+_SITE_DOMAINS = {
+    "olx.com.br": "olx",
+    "zapimoveis.com.br": "zap",
+    "vivareal.com.br": "vivareal",
+    "quintoandar.com.br": "quintoandar",
+}
+
+# Chaves com o id ou o link do anúncio, usadas para achar o nó do anúncio da página
+# (e não o de um anúncio recomendado/similar embutido no mesmo estado)
+_ID_KEYS = ["id", "listId", "listingId", "adId", "legacyId"]
+_URL_KEYS = ["url", "link", "friendlyUrl", "canonicalUrl", "shareUrl", "@id"]
+
+_LISTING_TYPES = {
+    "product", "offer", "residence", "apartment", "house", "singlefamilyresidence",
+    "accommodation", "realestatelisting", "place",
+}
+
+
+def site_for_url(url):
+    """Returns the site key ("olx", "zap", ...) for a listing URL, or None."""
+    host = urlparse(url or "").netloc.lower()
+    for domain, site in _SITE_DOMAINS.items():
+        if host == domain or host.endswith("." + domain):
+            return site
+    return None
+
+
+def parse_number(value):
+    """Parses numbers in Brazilian format ("R$ 1.500,00", "60 m²", [2]) into float, or None."""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get("value", value.get("price"))
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = re.sub(r"[^\d,.]", "", str(value))
+    if not text:
+        return None
+    if "," in text:
+        text = text.replace(".", "").replace(",", ".")
+    elif re.fullmatch(r"\d{1,3}(\.\d{3})+", text):
+        text = text.replace(".", "")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _walk(obj):
+    """Yields every dict nested anywhere inside obj."""
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            yield current
+            stack.extend(current.values())
+        elif isinstance(current, list):
+            stack.extend(current)
+
+
+def _find_key(obj, keys):
+    """First non-empty value found for any of keys, trying keys in order of preference."""
+    for key in keys:
+        for node in _walk(obj):
+            if key in node and node[key] not in (None, "", [], {}):
+                return node[key]
+            # OLX lists attributes as [{"name": "rooms", "value": "2"}, ...]
+            if node.get("name") == key and node.get("value") not in (None, ""):
+                return node["value"]
+    return None
+
+
+def _url_path(value):
+    return urlparse(str(value)).path.rstrip("/")
+
+
+def _matches_page(node, path, ids):
+    """True when node carries the id or the URL of the page's listing."""
+    for key in _ID_KEYS:
+        if node.get(key) is not None and str(node[key]) in ids:
+            return True
+    for key in _URL_KEYS:
+        if isinstance(node.get(key), str) and _url_path(node[key]) == path:
+            return True
+    return False
+
+
+def _listing_node(payload, url, key_lists):
+    """
+    The node of payload describing the listing at url — its id or URL match the page —
+    holding most of key_lists; None when no node matches (callers then search the whole tree).
+    """
+    path = _url_path(url or "")
+    if len(path) <= 1:
+        return None
+    ids = set(re.findall(r"\d{5,}", path))
+    best, best_score = None, 0
+    for node in _walk(payload):
+        if not _matches_page(node, path, ids):
+            continue
+        score = sum(_find_key(node, keys) is not None for keys in key_lists)
+        if score > best_score:
+            best, best_score = node, score
+    return best
+
+
+def _format_address(address):
+    if isinstance(address, str):
+        return address.strip() or None
+    if not isinstance(address, dict):
+        return None
+    street = address.get("streetAddress") or address.get("street") or address.get("address")
+    number = address.get("streetNumber")
+    parts = [
+        f"{street}, {number}" if street and number else street,
+        address.get("neighborhood") or address.get("neighbourhood"),
+        address.get("addressLocality") or address.get("city") or address.get("municipality"),
+        address.get("addressRegion") or address.get("stateAcronym") or address.get("uf"),
+    ]
+    parts = [str(part).strip() for part in parts if part]
+    return ", ".join(parts) or None
+
+
+def _from_json_ld(soup, url=None):
+    found = {}
+    path = _url_path(url or "")
+    ids = set(re.findall(r"\d{5,}", path))
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            payload = json.loads(script.string or script.get_text())
+        except (ValueError, TypeError):
+            continue
+        nodes = list(_walk(payload))
+        if len(path) > 1:
+            # O nó com o link/id da própria página vem antes de listas de anúncios similares
+            nodes.sort(key=lambda node: not _matches_page(node, path, ids))
+        for node in nodes:
+            types = node.get("@type", [])
+            types = {t.lower() for t in (types if isinstance(types, list) else [types]) if isinstance(t, str)}
+            if not types & _LISTING_TYPES:
+                continue
+            offers = node.get("offers")
+            candidates = {
+                "Preço do Aluguel (R$)": parse_number(offers) if offers else parse_number(node.get("price")),
+                "Tamanho (m²)": parse_number(node.get("floorSize")),
+                "Quartos": parse_number(node.get("numberOfBedrooms") or node.get("numberOfRooms")),
+                "Banheiros": parse_number(node.get("numberOfBathroomsTotal") or node.get("numberOfFullBathrooms")),
+                "Endereço": _format_address(node.get("address")),
+                "Observações": node.get("description"),
+            }
+            for field, value in candidates.items():
+                if value not in (None, "") and field not in found:
+                    found[field] = value
+    return found
+
+
+def _from_meta(soup):
+    found = {}
+    price = soup.find("meta", attrs={"property": "product:price:amount"})
+    if price and price.get("content"):
+        found["Preço do Aluguel (R$)"] = parse_number(price["content"])
+    description = soup.find("meta", attrs={"property": "og:description"}) or soup.find("meta", attrs={"name": "description"})
+    if description and description.get("content"):
+        found["Observações"] = description["content"].strip()
+    return found
+
+
+def _embedded_json(soup):
+    """Page state embedded by Next.js (__NEXT_DATA__) or OLX's legacy initial-data block."""
+    payloads = []
+    script = soup.find("script", id="__NEXT_DATA__")
+    if script:
+        try:
+            payloads.append(json.loads(script.string or script.get_text()))
+        except (ValueError, TypeError):
+            pass
+    initial = soup.find(id="initial-data")
+    if initial and initial.get("data-json"):
+        try:
+            payloads.append(json.loads(initial["data-json"]))
+        except (ValueError, TypeError):
+            pass
+    return payloads
+
+
+def _rental_price(payload):
+    """ZAP/VivaReal list one pricingInfos entry per business type; take the rental one."""
+    for node in _walk(payload):
+        if str(node.get("businessType", "")).upper() == "RENTAL" and node.get("price"):
+            return parse_number(node["price"])
+    return None
+
+
+def _from_site(soup, site, url=None):
+    found = {}
+    key_lists = list(SITE_KEYS[site].values()) + [["address", "location"]]
+    for payload in _embedded_json(soup):
+        # Só o nó do anúncio da página; a árvore inteira apenas se ele não for encontrado
+        payload = _listing_node(payload, url, key_lists) or payload
+        if site in ("zap", "vivareal") and "Preço do Aluguel (R$)" not in found:
+            price = _rental_price(payload)
+            if price is not None:
+                found["Preço do Aluguel (R$)"] = price
+        for field, keys in SITE_KEYS[site].items():
+            if field in found:
+                continue
+            value = _find_key(payload, keys)
+            if value is None:
+                continue
+            found[field] = value if field == "Observações" else parse_number(value)
+        address = _find_key(payload, ["address", "location"])
+        if "Endereço" not in found and _format_address(address):
+            found["Endereço"] = _format_address(address)
+    return {field: value for field, value in found.items() if value not in (None, "")}
+
+
+def extract_structured_data(html, url=None):
+    """
+    Extracts listing fields deterministically from JSON-LD, meta tags and, for OLX, ZAP,
+    VivaReal and QuintoAndar, the page state they embed. Returns a (possibly partial) dict
+    with the same keys as scraper.extract_property_data.
+    """
+    from bs4 import BeautifulSoup  # adiado: páginas que não usam o auto-preenchimento não pagam o import
+
+    soup = BeautifulSoup(html, "html.parser")
+    found = {}
+    site = site_for_url(url)
+    # Fontes mais específicas primeiro; as seguintes só completam campos faltantes
+    sources = ([_from_site(soup, site, url)] if site else []) + [_from_json_ld(soup, url), _from_meta(soup)]
+    for source in sources:
+        for field, value in source.items():
+            if field not in found and value not in (None, ""):
+                found[field] = value
+    for field in ("Quartos", "Banheiros"):
+        if field in found:
+            found[field] = int(found[field])
+    return found
+
+
+def missing_fields(data):
+    """Required fields still missing from a (partial) extraction."""
+    return [field for field in REQUIRED_FIELDS if data.get(field) in (None, "")]
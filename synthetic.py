@@ -0,0 +1,85 @@
+"""Synthetic Curitiba-area properties and listing pages for benchmarks and load tests."""
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from data import COLUMNS
+
+# Caixa aproximada da área urbana de Curitiba
+LAT_RANGE = (-25.60, -25.35)
+LON_RANGE = (-49.39, -49.18)
+
+STREETS = [
+    "Rua XV de Novembro", "Avenida Sete de Setembro", "Rua Marechal Deodoro", "Avenida Visconde de Guarapuava",
+    "Rua Comendador Araújo", "Avenida Batel", "Rua Padre Anchieta", "Avenida Manoel Ribas",
+    "Rua Mateus Leme", "Avenida João Gualberto", "Rua Brigadeiro Franco", "Avenida República Argentina",
+    "Rua Desembargador Motta", "Avenida Iguaçu", "Rua Chile", "Rua Itupava", "Avenida Paraná",
+    "Rua Fernando Simas", "Avenida Toaldo Túlio", "Rua Governador Agamenon Magalhães",
+]
+NEIGHBORHOODS = [
+    "Centro", "Batel", "Água Verde", "Bigorrilho", "Cristo Rei", "Rebouças", "Alto da XV",
+    "Juvevê", "Portão", "Santa Felicidade", "Cabral", "Mercês", "Boa Vista", "Hauer", "Cajuru",
+]
+FEATURES = [
+    "Apartamento reformado", "Próximo ao terminal de ônibus", "Varanda com churrasqueira", "Aceita pets",
+    "Prédio com portaria 24h", "Vaga de garagem coberta", "Cozinha planejada", "Bem iluminado",
+    "Perto de mercado e farmácia", "Condomínio com academia", "Piso laminado", "Sem elevador",
+]
+
+
+def generate_properties(n, seed=42):
+    """DataFrame with n synthetic properties in the store's columns."""
+    rng = np.random.default_rng(seed)
+    streets = rng.integers(0, len(STREETS), n)
+    numbers = rng.integers(10, 4000, n)
+    hoods = rng.integers(0, len(NEIGHBORHOODS), n)
+    rooms = rng.choice([1, 2, 3, 4], n, p=[0.3, 0.4, 0.25, 0.05])
+    size = np.round(rng.normal(30 + 22 * rooms, 8).clip(18, 400), 2)
+    quality = rng.integers(1, 6, n)
+    price = np.round(size * rng.normal(28, 6, n).clip(12, 70) + quality * 80, -1)
+    days = rng.integers(0, 3 * 365, n)
+    feature_picks = rng.integers(0, len(FEATURES), (n, 3))
+    has_url = rng.random(n) < 0.3
+    today = date(2026, 1, 1)
+    return pd.DataFrame({
+        "Endereço": [f"{STREETS[s]}, {num} - {NEIGHBORHOODS[h]}, Curitiba - PR"
+                     for s, num, h in zip(streets, numbers, hoods)],
+        "Tamanho (m²)": size,
+        "Quartos": rooms,
+        "Banheiros": np.maximum(1, rooms - rng.integers(0, 2, n)),
+        "Preço do Aluguel (R$)": price,
+        "Observações": [". ".join(FEATURES[i] for i in picks) + "." for picks in feature_picks],
+        "Qualidade": quality,
+        "Data da Visita": [(today - timedelta(days=int(d))).isoformat() for d in days],
+        "Latitude": np.round(rng.uniform(*LAT_RANGE, n), 7),
+        "Longitude": np.round(rng.uniform(*LON_RANGE, n), 7),
+        "URL": [f"https://www.olx.com.br/imoveis/aluguel/{i}" if u else "" for i, u in enumerate(has_url)],
+    })[COLUMNS]
+
+
+def listing_html(listing_id):
+    """A listing page without structured data, so extraction has to go through the LLM."""
+    rng = random.Random(listing_id)
+    rooms = rng.choice([1, 2, 3])
+    size = rng.randint(25, 50) + 20 * rooms
+    price = size * rng.randint(20, 35)
+    address = f"{rng.choice(STREETS)}, {rng.randint(10, 3000)} - {rng.choice(NEIGHBORHOODS)}, Curitiba - PR"
+    features = ". ".join(rng.sample(FEATURES, 3))
+    price_text = f"{price:,}".replace(",", ".")
+    navigation = "".join(f"<li><a href='/c/{i}'>Categoria {i}</a></li>" for i in range(40))
+    return f"""<!DOCTYPE html>
+<html><head><title>Apartamento para alugar - anúncio {listing_id}</title></head>
+<body>
+<nav><ul>{navigation}</ul></nav>
+<main>
+<h1>Apartamento com {rooms} quartos para alugar</h1>
+<p>Endereço: {address}</p>
+<p>Aluguel: R$ {price_text}</p>
+<p>Área útil: {size} m²</p>
+<p>{rooms} quartos, {max(1, rooms - 1)} banheiro(s)</p>
+<p>{features}.</p>
+</main>
+<footer>Todos os direitos reservados. Termos de uso. Política de privacidade.</footer>
+</body></html>"""
@@ -1,28 +1,118 @@
-import requests
-import streamlit as st
+import os
 import time
+import re
+import unicodedata
+import http_client
+import metrics
+from data import get_connection
 
-NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+# Configurável para apontar para um servidor próprio ou para mock_servers.py
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
 
-def geocode_address(address):
+# Headers required by Nominatim to avoid 403 errors
+NOMINATIM_HEADERS = {
+    'User-Agent': 'SistemaAnotacaoImoveis/1.0 (https://github.com/user/sistema-anotacao-imoveis; user@example.com)',
+    'Accept': 'application/json',
+    'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8'
+}
+
+# Validade das entradas do cache de geocodificação (segundos)
+GEOCODE_CACHE_TTL = 30 * 24 * 3600
+GEOCODE_NEGATIVE_CACHE_TTL = 24 * 3600
+
+_ABBREVIATIONS = {
+    "r": "rua",
+    "av": "avenida",
+    "al": "alameda",
+    "trav": "travessa",
+    "tv": "travessa",
+    "pc": "praca",
+    "pca": "praca",
+    "rod": "rodovia",
+    "est": "estrada",
+}
+
+
+def normalize_address(address):
     """
-    Converte um endereço em coordenadas de latitude e longitude usando a API Nominatim.
+    Normaliza um endereço para uso como chave: sem acentos, minúsculo, sem pontuação
+    e com abreviações comuns (R., Av., ...) expandidas.
+    """
+    text = unicodedata.normalize("NFKD", str(address or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    tokens = re.sub(r"[^a-z0-9]+", " ", text).split()
+    return " ".join(_ABBREVIATIONS.get(token, token) for token in tokens)
+
+
+def get_cached_geocode(address):
+    """
+    Retorna (lat, lon) do cache, (None, None) para um endereço sabidamente não encontrado,
+    ou None quando não há entrada válida.
+    """
+    key = normalize_address(address)
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT latitude, longitude, criado_em FROM geocode_cache WHERE chave = ?", (key,)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    lat, lon, created_at = row
+    ttl = GEOCODE_CACHE_TTL if lat is not None else GEOCODE_NEGATIVE_CACHE_TTL
+    if time.time() - created_at > ttl:
+        return None
+    return lat, lon
+
+
+def store_cached_geocode(address, lat, lon):
+    """Grava o resultado (ou a ausência de resultado, com lat/lon None) no cache."""
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO geocode_cache (chave, latitude, longitude, criado_em) VALUES (?, ?, ?, ?)",
+                (normalize_address(address), lat, lon, time.time()),
+            )
+    finally:
+        conn.close()
+
+
+def nominatim_request(address, session=None, timeout=None, retries=http_client.MAX_RETRIES, **kwargs):
+    """
+    Faz a busca de um endereço no Nominatim e retorna a resposta HTTP bruta.
+    Usa a sessão compartilhada de http_client (conexões reaproveitadas, novas tentativas);
+    kwargs extras (retry_status, throttle) vão para http_client.request.
     """
     params = {
         "q": address,
         "format": "json",
         "limit": 1
     }
-    
-    # Headers required by Nominatim to avoid 403 errors
-    headers = {
-        'User-Agent': 'SistemaAnotacaoImoveis/1.0 (https://github.com/user/sistema-anotacao-imoveis; user@example.com)',
-        'Accept': 'application/json',
-        'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8'
-    }
-    
+    return http_client.get(NOMINATIM_URL, endpoint="nominatim", session=session, timeout=timeout,
+                           retries=retries, params=params, headers=NOMINATIM_HEADERS, **kwargs)
+
+
+@metrics.timed("geocode_address")
+def geocode_address(address):
+    """
+    Converte um endereço em coordenadas de latitude e longitude usando a API Nominatim.
+    Consulta primeiro o cache local, indexado pelo endereço normalizado.
+    """
+    # Importados aqui: scripts de linha de comando (batch_geocode) não carregam o Streamlit,
+    # e páginas que não geocodificam não carregam o requests
+    import requests
+    import streamlit as st
+
+    cached = get_cached_geocode(address)
+    if cached is not None:
+        if cached[0] is None:
+            st.warning(f"Endereço não encontrado: {address}. Por favor, verifique o endereço.")
+        return cached
+
     try:
-        response = requests.get(NOMINATIM_URL, params=params, headers=headers, timeout=10)
+        response = nominatim_request(address)
         
         # Check if we got a successful response
         if response.status_code == 200:
@@ -30,8 +120,10 @@ def geocode_address(address):
             if data:
                 lat = float(data[0]["lat"])
                 lon = float(data[0]["lon"])
+                store_cached_geocode(address, lat, lon)
                 return lat, lon
             else:
+                store_cached_geocode(address, None, None)
                 st.warning(f"Endereço não encontrado: {address}. Por favor, verifique o endereço.")
                 return None, None
         else:
@@ -42,6 +134,7 @@ def geocode_address(address):
                     if data:
                         lat = float(data[0]["lat"])
                         lon = float(data[0]["lon"])
+                        store_cached_geocode(address, lat, lon)
                         st.info("Geocodificação realizada com sucesso!")
                         return lat, lon
                 except: